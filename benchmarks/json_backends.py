@@ -0,0 +1,50 @@
+"""
+Compare the encoding time of the installed JSON backends of ``braces.jsonbackends``
+
+Run it from a checkout of the repository with ``python benchmarks/json_backends.py``,
+or import ``benchmark`` to time your own payloads.
+"""
+import datetime, decimal, os, sys, timeit, uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings
+if not settings.configured:
+    settings.configure()
+
+from braces.jsonbackends import BACKENDS, dumps, get_module
+
+
+def benchmark(payload=None, number=100):
+    """
+    Return the time in seconds taken by each installed backend to encode the payload
+    ``number`` times
+
+    The default payload is a list of 1000 dicts looking like serialized model rows.
+    """
+    if payload is None:
+        now = datetime.datetime(2012, 6, 1, 12, 30, 15, 123456)
+        payload = [{
+            'pk': i,
+            'title': u'Title number %d - with some text' % i,
+            'published': i % 2 == 0,
+            'created': now,
+            'day': now.date(),
+            'price': decimal.Decimal('%d.99' % i),
+            'uid': uuid.UUID(int=i),
+            'tags': ['django', 'braces', 'json'],
+            'score': i / 3.0,
+            'author': None,
+        } for i in range(1000)]
+    timings = {}
+    for name in BACKENDS:
+        if get_module(name) is None:
+            continue
+        timings[name] = timeit.timeit(lambda: dumps(payload, backend=name),
+                                      number=number)
+    return timings
+
+
+if __name__ == '__main__':
+    for name, seconds in sorted(benchmark().items(), key=lambda item: item[1]):
+        print('%-10s %.3fs' % (name, seconds))
@@ -0,0 +1,138 @@
+"""
+Caching helpers shared by the mixins
+"""
+import threading, time
+try:
+    from collections import OrderedDict
+except ImportError:  # Python < 2.7
+    from django.utils.datastructures import SortedDict as OrderedDict
+
+
+def get_cache_backend(alias='default'):
+    """
+    Return the Django cache backend for the given alias
+    """
+    try:
+        from django.core.cache import caches
+    except ImportError:  # Django < 1.7
+        from django.core.cache import get_cache
+        return get_cache(alias)
+    return caches[alias]
+
+
+class LRUCache(object):
+    """
+    Bounded in-process cache keeping the ``max_entries`` most recently used values
+
+    It has the same ``get()``, ``set()`` and ``delete()`` methods than the Django
+    cache backends so it can be used in place of them.
+    """
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires < time.time():
+                return default
+            self._data[key] = (expires, value)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = None if timeout is None else time.time() + timeout
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+            while len(self._data) > self.max_entries:
+                del self._data[next(iter(self._data))]
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce the concurrent calls for the same key so only one of them does the work
+    and the others wait for and share its result
+
+    Within a process the calls are coalesced with a lock. When a cache backend is
+    given, the caller doing the work also takes a lock in the cache with ``add()``
+    and stores its result there for ``result_timeout`` seconds, so callers from other
+    processes wait for it (by polling the cache every ``poll_interval`` seconds)
+    instead of doing the work again. Results must be picklable in this case.
+
+    Waiting callers give up after ``timeout`` seconds and do the work themselves.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, cache=None, timeout=60, result_timeout=10,
+           poll_interval=0.1):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait(timeout)
+            if call.event.is_set():
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            return func()
+
+        try:
+            if cache is None:
+                call.result = func()
+            else:
+                call.result = self._do_shared(key, func, cache, timeout,
+                                              result_timeout, poll_interval)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _do_shared(self, key, func, cache, timeout, result_timeout, poll_interval):
+        lock_key = 'braces.singleflight.lock.%s' % key
+        result_key = 'braces.singleflight.result.%s' % key
+        deadline = time.time() + timeout
+        while True:
+            result = cache.get(result_key)
+            if result is not None:
+                return result
+            if cache.add(lock_key, 1, timeout):
+                try:
+                    result = func()
+                    cache.set(result_key, result, result_timeout)
+                    return result
+                finally:
+                    cache.delete(lock_key)
+            if time.time() > deadline:
+                return func()
+            time.sleep(poll_interval)
+
+
+default_flight = SingleFlight()
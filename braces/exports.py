@@ -0,0 +1,240 @@
+"""
+Local storage and execution of background exports
+
+Exports are identified by a key computed from their parameters, the finished
+artifacts are stored as files in a directory where they are kept for a given time to
+live, within a total size limit.
+"""
+import errno, logging, os, tempfile, threading, time
+try:
+    from Queue import Queue
+except ImportError:  # Python 3
+    from queue import Queue
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+logger = logging.getLogger('braces')
+
+
+def make_export_key(*params):
+    """
+    Return a key (usable as a filename) from the given export parameters
+    
+    It is a HMAC of the parameters with the ``SECRET_KEY``, so keys can not be 
+    computed by clients from parameters they can guess.
+    """
+    value = b'\0'.join([param if isinstance(param, bytes) else param.encode('utf-8')
+                        for param in params])
+    return salted_hmac('braces.exports.make_export_key', value).hexdigest()
+
+
+class ThreadExecutor(object):
+    """
+    Minimal pool of daemon threads to run the export jobs
+
+    Any object with a compatible ``submit(func, *args, **kwargs)`` method can be used
+    instead (like a ``concurrent.futures`` executor).
+    """
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._queue = Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        self._start()
+        self._queue.put((func, args, kwargs))
+
+    def _start(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name='braces-export')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            func, args, kwargs = self._queue.get()
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("Background export job failed")
+            finally:
+                self._queue.task_done()
+
+
+class ExportStore(object):
+    """
+    Store of the export artifacts and of the jobs states in a local directory
+
+    For each key there can be a ``.lock`` file while the job is running (considered
+    as dead after ``job_timeout`` seconds), an ``.error`` file if the job has failed
+    and the ``.export`` artifact file once finished. Using files makes the states
+    visible to all the processes of the server sharing the same directory.
+
+    Artifacts older than ``ttl`` seconds are not used anymore, and the oldest ones
+    are removed when the artifacts total size exceeds ``max_size`` bytes.
+    """
+    def __init__(self, root, ttl=3600, max_size=None, job_timeout=3600):
+        self.root = root
+        self.ttl = ttl
+        self.max_size = max_size
+        self.job_timeout = job_timeout
+
+    def _path(self, key, extension):
+        return os.path.join(self.root, '%s.%s' % (key, extension))
+
+    def _age(self, path):
+        try:
+            return time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _ensure_root(self):
+        try:
+            os.makedirs(self.root)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def get(self, key):
+        """
+        Return the path of the fresh artifact for the key, or None
+        """
+        path = self._path(key, 'export')
+        age = self._age(path)
+        if age is None:
+            return None
+        if self.ttl is not None and age > self.ttl:
+            self._remove(path)
+            return None
+        return path
+
+    def status(self, key):
+        """
+        Return the job state for the key : "done", "running", "failed" or None if
+        there is no such job
+        """
+        if self.get(key) is not None:
+            return 'done'
+        age = self._age(self._path(key, 'lock'))
+        if age is not None and age <= self.job_timeout:
+            return 'running'
+        if self._age(self._path(key, 'error')) is not None:
+            return 'failed'
+        return None
+
+    def acquire(self, key):
+        """
+        Mark the job for the key as running, return False if it is already running
+        """
+        self._ensure_root()
+        path = self._path(key, 'lock')
+        age = self._age(path)
+        if age is not None and age > self.job_timeout:
+            # The process running the job has probably died
+            self._remove(path)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except OSError as e:
+            if e.errno == errno.EEXIST:
+                return False
+            raise
+        self._remove(self._path(key, 'error'))
+        return True
+
+    def save(self, key, chunks):
+        """
+        Write the artifact from the given chunks and release the job
+
+        The chunks are written to a temporary file which is renamed once complete, so
+        there is never a partial artifact under the key.
+        """
+        self._ensure_root()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as artifact:
+                for chunk in chunks:
+                    if not isinstance(chunk, bytes):
+                        chunk = chunk.encode('utf-8')
+                    artifact.write(chunk)
+            os.rename(tmp_path, self._path(key, 'export'))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+        finally:
+            self._remove(self._path(key, 'lock'))
+        self.evict()
+        return self._path(key, 'export')
+
+    def fail(self, key, message=''):
+        """
+        Mark the job for the key as failed, remove its artifact if any and release it
+        """
+        self._ensure_root()
+        self._remove(self._path(key, 'export'))
+        with open(self._path(key, 'error'), 'w') as error:
+            error.write(message)
+        self._remove(self._path(key, 'lock'))
+
+    def evict(self):
+        """
+        Remove the expired artifacts, then the oldest ones until their total size
+        is below ``max_size``
+        """
+        artifacts = []
+        for filename in os.listdir(self.root):
+            if not filename.endswith('.export'):
+                continue
+            path = os.path.join(self.root, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if self.ttl is not None and time.time() - stat.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                artifacts.append((stat.st_mtime, stat.st_size, path))
+        if self.max_size is None:
+            return
+        total = sum([size for mtime, size, path in artifacts])
+        for mtime, size, path in sorted(artifacts):
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+
+_default_store = None
+_default_executor = None
+
+
+def get_default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = ExportStore(
+            getattr(settings, 'BRACES_EXPORT_ROOT',
+                    os.path.join(tempfile.gettempdir(), 'braces-exports')),
+            ttl=getattr(settings, 'BRACES_EXPORT_TTL', 3600),
+            max_size=getattr(settings, 'BRACES_EXPORT_MAX_SIZE', None),
+            job_timeout=getattr(settings, 'BRACES_EXPORT_JOB_TIMEOUT', 3600),
+        )
+    return _default_store
+
+
+def get_default_executor():
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ThreadExecutor(getattr(settings, 'BRACES_EXPORT_WORKERS', 2))
+    return _default_executor
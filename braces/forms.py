@@ -1,3 +1,7 @@
+from django.core.exceptions import ValidationError
+from django.forms.formsets import BaseFormSet, formset_factory
+
+
 class UserKwargModelFormMixin(object):
     """
     Generic model form mixin for popping user out of the kwargs and
@@ -11,3 +15,50 @@ class UserKwargModelFormMixin(object):
         self.user = kwargs.pop("user", None)  # Pop the user off the
                                               # passed in kwargs.
         super(UserKwargModelFormMixin, self).__init__(*args, **kwargs)
+
+
+class BulkFormSet(BaseFormSet):
+    """
+    Formset giving the same extra kwargs to all its forms (like the forms of a 
+    ``FormMixin`` view get) and accepting at most ``max_entries`` forms.
+
+    With ``strict``, every submitted form must be valid, even if it has not been 
+    changed (extra forms can be left empty else).
+    """
+    max_entries = 1000
+    strict = False
+
+    def __init__(self, *args, **kwargs):
+        # The forms are built by the formset constructor
+        self.bulk_form_kwargs = kwargs.pop('bulk_form_kwargs', {})
+        self.strict = kwargs.pop('strict', self.strict)
+        super(BulkFormSet, self).__init__(*args, **kwargs)
+
+    def total_form_count(self):
+        # Do not build more forms than needed to know there are too many
+        return min(super(BulkFormSet, self).total_form_count(), self.max_entries + 1)
+
+    def _construct_form(self, i, **kwargs):
+        kwargs.update(self.bulk_form_kwargs)
+        if self.strict:
+            kwargs['empty_permitted'] = False
+        return super(BulkFormSet, self)._construct_form(i, **kwargs)
+
+    def clean(self):
+        super(BulkFormSet, self).clean()
+        if self.total_form_count() > self.max_entries:
+            raise ValidationError(u"Please submit %d or fewer entries." % self.max_entries)
+
+    def get_changed_forms(self):
+        """
+        Return the forms to save, the changed ones unless ``strict``
+        """
+        return [form for form in self.forms if self.strict or form.has_changed()]
+
+
+def bulk_formset_factory(form, formset=BulkFormSet, extra=1, max_entries=1000):
+    """
+    Return a ``BulkFormSet`` class for the form
+    """
+    formset = type(formset.__name__, (formset,), {'max_entries': max_entries})
+    return formset_factory(form, formset=formset, extra=extra, max_num=max_entries)
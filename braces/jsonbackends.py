@@ -0,0 +1,156 @@
+"""
+JSON encoding with the fastest available library
+
+The backend is chosen with the ``BRACES_JSON_BACKEND`` setting : ``"auto"`` (the
+default) uses the first installed of ``orjson``, ``rapidjson`` and ``ujson``, else the
+standard ``json`` module. Dates, times, Decimals, UUIDs and lazy translation strings
+are encoded the same way whatever the backend is, like with ``DjangoJSONEncoder``.
+
+Options a backend does not support (like an indentation other than 2 with
+``orjson``, or a custom encoder class) and values it can not encode make it fall back
+to the standard ``json`` module.
+
+NaN and infinite floats are not valid JSON and each library writes them its own way
+(``orjson`` as ``null``), so they raise a ``ValueError`` whatever the backend is.
+"""
+import datetime, decimal, json, uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.functional import Promise
+try:
+    from django.utils.encoding import force_text
+except ImportError:  # Django < 1.5
+    from django.utils.encoding import force_unicode as force_text
+
+BACKENDS = ('orjson', 'rapidjson', 'ujson', 'json')
+
+
+class JSONEncoder(DjangoJSONEncoder):
+    """
+    ``DjangoJSONEncoder`` also supporting UUIDs and lazy strings on all Django versions
+    """
+    def default(self, o):
+        if isinstance(o, Promise):
+            return force_text(o)
+        if isinstance(o, uuid.UUID):
+            return str(o)
+        return super(JSONEncoder, self).default(o)
+
+
+_default = JSONEncoder().default
+_modules = {}
+_SPECIAL_TYPES = (datetime.datetime, datetime.date, datetime.time, decimal.Decimal,
+                  uuid.UUID, Promise)
+_INFINITY = float('inf')
+
+
+def get_module(name):
+    """
+    Return the module of a backend or None if it is not installed
+    """
+    if name not in _modules:
+        try:
+            _modules[name] = __import__(name)
+        except ImportError:
+            _modules[name] = None
+    return _modules[name]
+
+
+def get_backend(name=None):
+    """
+    Return the name of the backend to use, from the given name or the setting
+    """
+    if name is None:
+        name = getattr(settings, 'BRACES_JSON_BACKEND', 'auto')
+    if name == 'auto':
+        for name in BACKENDS:
+            if get_module(name) is not None:
+                return name
+    if name not in BACKENDS or get_module(name) is None:
+        return 'json'
+    return name
+
+
+def _is_finite(value):
+    return value == value and value not in (_INFINITY, -_INFINITY)
+
+
+def _has_non_finite(obj):
+    """
+    Return True if the object contains NaN or infinite floats
+    """
+    if isinstance(obj, float):
+        return not _is_finite(obj)
+    if isinstance(obj, dict):
+        obj = obj.values()
+    elif not isinstance(obj, (list, tuple)):
+        return False
+    for value in obj:
+        if _has_non_finite(value):
+            return True
+    return False
+
+
+def _normalize(obj):
+    """
+    Convert the values natively encoded in another way by ujson
+    """
+    if isinstance(obj, dict):
+        return dict([(key, _normalize(value)) for key, value in obj.items()])
+    if isinstance(obj, (list, tuple)):
+        return [_normalize(value) for value in obj]
+    if isinstance(obj, _SPECIAL_TYPES):
+        return _default(obj)
+    if isinstance(obj, float) and not _is_finite(obj):
+        raise ValueError("Out of range float values are not JSON compliant")
+    return obj
+
+
+def _dumps_orjson(obj, indent, ensure_ascii):
+    orjson = get_module('orjson')
+    if ensure_ascii or indent not in (None, 2):
+        return None
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if indent == 2:
+        option |= orjson.OPT_INDENT_2
+    data = orjson.dumps(obj, default=_default, option=option)
+    # orjson writes NaN and infinite floats as null
+    if b'null' in data and _has_non_finite(obj):
+        raise ValueError("Out of range float values are not JSON compliant")
+    return data
+
+
+def _dumps_rapidjson(obj, indent, ensure_ascii):
+    rapidjson = get_module('rapidjson')
+    return rapidjson.dumps(obj, default=_default, indent=indent,
+                           ensure_ascii=ensure_ascii, allow_nan=False)
+
+
+def _dumps_ujson(obj, indent, ensure_ascii):
+    ujson = get_module('ujson')
+    return ujson.dumps(_normalize(obj), indent=indent or 0, ensure_ascii=ensure_ascii,
+                       escape_forward_slashes=False)
+
+
+def dumps(obj, indent=None, ensure_ascii=False, cls=None, backend=None):
+    """
+    Encode the object to JSON and return it as an UTF-8 bytestring
+
+    ``cls`` is a custom encoder class, only the standard module is used with it.
+    Raise a ``ValueError`` if the object contains NaN or infinite floats.
+    """
+    data = None
+    name = get_backend(backend)
+    if name != 'json' and cls in (None, DjangoJSONEncoder, JSONEncoder):
+        try:
+            data = globals()['_dumps_%s' % name](obj, indent, ensure_ascii)
+        except (TypeError, ValueError, OverflowError):
+            data = None
+    if data is None:
+        data = json.dumps(obj, cls=cls or JSONEncoder, indent=indent,
+                          ensure_ascii=ensure_ascii, allow_nan=False)
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+    return data
+
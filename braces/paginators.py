@@ -0,0 +1,288 @@
+"""
+Paginators for the list views
+"""
+import datetime, decimal, hashlib, json, uuid
+
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import connections
+from django.db.models import Q
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:  # Django < 1.11
+    from django.db.models.sql.datastructures import EmptyResultSet
+try:
+    from django.db.models.fields import FieldDoesNotExist
+except ImportError:  # Django >= 3.1
+    from django.core.exceptions import FieldDoesNotExist
+try:
+    from django.utils.encoding import force_text
+except ImportError:  # Django < 1.5
+    from django.utils.encoding import force_unicode as force_text
+
+
+COUNT_STRATEGIES = ('exact', 'cached', 'estimate')
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def get_query_sql(queryset):
+    """
+    Return the SQL and parameters of the queryset, or None if it can not match
+    anything
+    """
+    try:
+        return queryset.query.get_compiler(using=queryset.db).as_sql()
+    except EmptyResultSet:
+        return None
+
+
+def get_estimated_count(queryset):
+    """
+    Return the rows count of the queryset estimated by the database planner, or None
+    if the database does not give it (only PostgreSQL is supported)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql = get_query_sql(queryset)
+    if sql is None:
+        return 0
+    cursor = connection.cursor()
+    try:
+        cursor.execute('EXPLAIN (FORMAT JSON) %s' % sql[0], sql[1])
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    if isinstance(plan, basestring):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CountPaginator(Paginator):
+    """
+    Paginator with a cheaper way to count the objects than an exact ``COUNT(*)``
+
+    ``count_strategy`` is one of :
+
+    * ``exact`` : the default ``Paginator`` count;
+    * ``cached`` : the exact count is kept in the ``count_cache`` backend for
+      ``count_cache_timeout`` seconds, keyed by the SQL of the queryset;
+    * ``estimate`` : the count estimated by the database planner, or the exact count
+      when the estimate is under ``count_estimate_threshold`` or when the database does
+      not give estimates.
+
+    Lists which are not querysets are always counted exactly.
+    """
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 count_strategy='exact', count_cache=None, count_cache_timeout=300,
+                 count_estimate_threshold=10000):
+        if count_strategy not in COUNT_STRATEGIES:
+            raise ImproperlyConfigured(u"Count strategy must be one of %s, got %r."
+                                       % (", ".join(COUNT_STRATEGIES), count_strategy))
+        super(CountPaginator, self).__init__(object_list, per_page, orphans=orphans,
+                                             allow_empty_first_page=allow_empty_first_page)
+        self.count_strategy = count_strategy
+        self.count_cache = count_cache
+        self.count_cache_timeout = count_cache_timeout
+        self.count_estimate_threshold = count_estimate_threshold
+
+    def get_exact_count(self):
+        try:
+            return self.object_list.count()
+        except (AttributeError, TypeError):
+            # Not a queryset, or a list (count() needs an argument)
+            return len(self.object_list)
+
+    def get_count_cache_key(self):
+        sql = get_query_sql(self.object_list)
+        if sql is None:
+            return None
+        signature = u'%s:%s:%r' % (self.object_list.db, sql[0], tuple(sql[1]))
+        return 'braces.paginators.count.%s' % hashlib.md5(
+            signature.encode('utf-8')).hexdigest()
+
+    def get_cached_count(self):
+        key = self.get_count_cache_key()
+        if key is None:
+            return 0
+        count = self.count_cache.get(key)
+        if count is None:
+            count = self.get_exact_count()
+            self.count_cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def get_strategy_count(self):
+        if self.count_strategy == 'exact' or not hasattr(self.object_list, 'query'):
+            return self.get_exact_count()
+        if self.count_strategy == 'cached':
+            return self.get_cached_count()
+        count = get_estimated_count(self.object_list)
+        if count is None or count < self.count_estimate_threshold:
+            return self.get_exact_count()
+        return count
+
+    @property
+    def count(self):
+        if getattr(self, '_strategy_count', None) is None:
+            self._strategy_count = self.get_strategy_count()
+        return self._strategy_count
+
+
+class KeysetPage(object):
+    """
+    A page of a ``KeysetPaginator``
+
+    It has the same ``object_list``, ``has_next()``, ``has_previous()`` and
+    ``has_other_pages()`` than the Django pages, but no page numbers. The cursors to
+    the next and previous pages are ``next_cursor`` and ``previous_cursor`` (None when
+    there is no such page).
+    """
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<KeysetPage of %d objects>' % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator(object):
+    """
+    Paginate a queryset on the values of its ordering instead of an offset
+
+    Each page is fetched with a filter on the values of the last (or first) row of the
+    previous (or next) page, so it takes the same time whatever its depth when the
+    ordering is indexed, and there is no ``COUNT`` query. The other side of it is that
+    pages have no numbers, they are reached with the opaque (and signed) cursors of
+    the pages around.
+
+    ``ordering`` is a list of field names, prefixed by "-" for a descending order, the
+    primary key is appended if it is missing to make the ordering unique. The fields
+    must be fields of the model (not relations lookups) and must not be null.
+    """
+    salt = 'braces.paginators.keyset'
+
+    def __init__(self, queryset, per_page, ordering, allow_empty_first_page=True):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.allow_empty_first_page = allow_empty_first_page
+        self.ordering = self.get_ordering(queryset.model, ordering)
+        self.salt = '%s.%s.%s' % (self.salt, queryset.model._meta.db_table,
+                                  ','.join(self.get_order_by()))
+
+    def get_ordering(self, model, ordering):
+        """
+        Return the ordering as a list of ``(field, descending)`` tuples
+        """
+        if isinstance(ordering, basestring):
+            ordering = [ordering]
+        fields = []
+        for name in ordering:
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            try:
+                field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(u"Keyset ordering field '%s' is not a field "
+                                           u"of %s." % (name, model.__name__))
+            fields.append((field, descending))
+        if model._meta.pk not in [field for field, descending in fields]:
+            fields.append((model._meta.pk, fields[-1][1] if fields else False))
+        return fields
+
+    def get_order_by(self, reverse=False):
+        return [('-' if descending != reverse else '') + field.attname
+                for field, descending in self.ordering]
+
+    def encode_value(self, value):
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, uuid.UUID)):
+            return force_text(value)
+        return value
+
+    def encode_cursor(self, obj, direction):
+        values = [self.encode_value(getattr(obj, field.attname))
+                  for field, descending in self.ordering]
+        return signing.dumps([direction, values], salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        """
+        Return the direction and the field values of the cursor
+        """
+        try:
+            direction, values = signing.loads(cursor, salt=self.salt)
+            if direction not in ('n', 'p') or len(values) != len(self.ordering):
+                raise ValueError
+            values = [field.to_python(value) for (field, descending), value
+                      in zip(self.ordering, values)]
+        except (signing.BadSignature, ValidationError, ValueError, TypeError):
+            raise InvalidCursor(u"Invalid cursor")
+        return direction, values
+
+    def get_filter(self, values, reverse=False):
+        """
+        Return the filter on the rows after the given values in the ordering (before
+        them if ``reverse``)
+        """
+        condition = None
+        for position, (field, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**{'%s__%s' % (field.attname, lookup): values[position]})
+            for (previous, previous_descending), value in zip(self.ordering[:position],
+                                                              values):
+                term &= Q(**{previous.attname: value})
+            condition = term if condition is None else condition | term
+        return condition
+
+    def page(self, cursor=None):
+        """
+        Return the page for the cursor, the first page if it is empty
+        """
+        direction, values = ('n', None)
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+        reverse = direction == 'p'
+        queryset = self.queryset.order_by(*self.get_order_by(reverse))
+        if values is not None:
+            queryset = queryset.filter(self.get_filter(values, reverse))
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if reverse:
+            object_list.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        if not object_list and not (values is None and self.allow_empty_first_page):
+            raise InvalidCursor(u"That page contains no results")
+
+        next_cursor = previous_cursor = None
+        if object_list and has_next:
+            next_cursor = self.encode_cursor(object_list[-1], 'n')
+        if object_list and has_previous:
+            previous_cursor = self.encode_cursor(object_list[0], 'p')
+        return KeysetPage(object_list, self, next_cursor, previous_cursor)
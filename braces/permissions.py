@@ -0,0 +1,141 @@
+"""
+Cross-request cache of the permission checks
+
+Cached checks are keyed with a global permission version stored in the cache
+backend named by the ``BRACES_PERMISSION_CACHE`` setting (``"default"`` by
+default). The version is bumped each time user or group permissions, group
+memberships, groups or permissions are changed, so all the cached checks are
+invalidated at once.
+
+The signals are connected when this module is imported, which is done by
+``braces.views``. Processes changing permissions without importing it (like some
+management commands) must import it to keep the cache in sync. Custom authentication
+backends using other data must call ``bump_permission_version()`` when it changes.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from braces.caching import get_cache_backend
+
+VERSION_KEY = 'braces.permissions.version'
+VERSION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def get_permission_cache():
+    return get_cache_backend(getattr(settings, 'BRACES_PERMISSION_CACHE', 'default'))
+
+
+def get_permission_version():
+    cache = get_permission_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, VERSION_TIMEOUT)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_permission_version():
+    """
+    Invalidate all the cached permission checks
+    """
+    cache = get_permission_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # The key does not exist (anymore)
+        cache.set(VERSION_KEY, 2, VERSION_TIMEOUT)
+
+
+def get_permission_cache_key(user, name):
+    """
+    Return the cache key of a check named ``name`` for the user
+    """
+    flags = '%d%d' % (bool(getattr(user, 'is_active', True)),
+                      bool(getattr(user, 'is_superuser', False)))
+    name = hashlib.md5(name.encode('utf-8')).hexdigest()
+    return 'braces.permissions.%s.%s.%s.%s' % (get_permission_version(), user.pk,
+                                               flags, name)
+
+
+def compile_permissions(spec):
+    """
+    Compile a permissions expression to a tree of ``(operator, operand)`` nodes
+
+    An expression is a permission name or a dict with one or more of the keys :
+
+    * ``all`` : a list or tuple of expressions which must all be true;
+    * ``any`` : a list or tuple of expressions where at least one must be true;
+    * ``not`` : an expression, or a list or tuple of expressions, which must be false.
+
+    All the keys of a dict must be true. Raise ``ImproperlyConfigured`` for invalid
+    expressions.
+    """
+    if isinstance(spec, basestring):
+        return ('perm', spec)
+    if not isinstance(spec, dict) or not spec:
+        raise ImproperlyConfigured("Permissions expressions must be permission "
+            "names or non empty dicts, got %r." % (spec,))
+    nodes = []
+    for key, value in spec.items():
+        if key in ('all', 'any'):
+            if not isinstance(value, (list, tuple)):
+                raise ImproperlyConfigured("Permissions expressions '%s' value must "
+                    "be a list or tuple." % key)
+            nodes.append((key, tuple([compile_permissions(item) for item in value])))
+        elif key == 'not':
+            if isinstance(value, (list, tuple)):
+                value = {'any': value}
+            nodes.append(('not', compile_permissions(value)))
+        else:
+            raise ImproperlyConfigured("Permissions expressions keys must be 'all', "
+                "'any' or 'not', got %r." % (key,))
+    if len(nodes) == 1:
+        return nodes[0]
+    return ('all', tuple(nodes))
+
+
+def evaluate_permissions(node, has_perm):
+    """
+    Evaluate a compiled permissions expression with the ``has_perm`` callable
+    """
+    operator, operand = node
+    if operator == 'perm':
+        return has_perm(operand)
+    if operator == 'all':
+        for item in operand:
+            if not evaluate_permissions(item, has_perm):
+                return False
+        return True
+    if operator == 'any':
+        for item in operand:
+            if evaluate_permissions(item, has_perm):
+                return True
+        return False
+    return not evaluate_permissions(operand, has_perm)
+
+
+def _permissions_changed(sender, **kwargs):
+    bump_permission_version()
+
+
+def _relations_changed(sender, instance, action, model=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if model in (Group, Permission) or isinstance(instance, (Group, Permission)):
+        bump_permission_version()
+
+
+def connect_signals():
+    for model in (Group, Permission):
+        post_save.connect(_permissions_changed, sender=model,
+                          dispatch_uid='braces_permissions_%s_save' % model.__name__)
+        post_delete.connect(_permissions_changed, sender=model,
+                            dispatch_uid='braces_permissions_%s_delete' % model.__name__)
+    m2m_changed.connect(_relations_changed, dispatch_uid='braces_permissions_m2m')
+
+
+connect_signals()
@@ -0,0 +1,108 @@
+"""
+Recording of the database queries run by a view
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_RE = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s)\s*,?)+\)', re.I)
+TABLE_RE = re.compile(r'\bFROM\s+["`\[]?(\w+)', re.I)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a view runs more queries than its budget
+    """
+    pass
+
+
+def get_query_shape(sql):
+    """
+    Return the SQL with its literal values replaced, so the same query with other
+    parameters has the same shape
+    """
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return IN_RE.sub('IN (...)', sql)
+
+
+class QueryRecorder(object):
+    """
+    Context manager recording the SQL of the queries run on a database connection
+
+    It uses the connection ``execute_wrapper()`` when it exists (Django 2.0 and
+    newer), else it forces the debug cursor and reads ``connection.queries``.
+    """
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.queries = []
+
+    def _wrapper(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.queries = []
+        if hasattr(self.connection, 'execute_wrapper'):
+            self._wrapper_context = self.connection.execute_wrapper(self._wrapper)
+            self._wrapper_context.__enter__()
+        else:
+            self._wrapper_context = None
+            self._debug_attribute = ('force_debug_cursor'
+                                     if hasattr(self.connection, 'force_debug_cursor')
+                                     else 'use_debug_cursor')
+            self._debug_cursor = getattr(self.connection, self._debug_attribute, None)
+            setattr(self.connection, self._debug_attribute, True)
+            self._start = len(self.connection.queries)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._wrapper_context is not None:
+            self._wrapper_context.__exit__(exc_type, exc_value, traceback)
+        else:
+            setattr(self.connection, self._debug_attribute, self._debug_cursor)
+            self.queries = [query['sql'] for query in
+                            self.connection.queries[self._start:]]
+
+    def __len__(self):
+        return len(self.queries)
+
+    def get_repeated_queries(self, threshold):
+        """
+        Return ``(shape, count)`` tuples for the query shapes run at least
+        ``threshold`` times, which generally reveal N+1 queries
+        """
+        counts = {}
+        for sql in self.queries:
+            shape = get_query_shape(sql)
+            counts[shape] = counts.get(shape, 0) + 1
+        repeated = [(shape, count) for shape, count in counts.items()
+                    if count >= threshold]
+        return sorted(repeated, key=lambda item: -item[1])
+
+
+def get_related_model(field):
+    remote_field = getattr(field, 'remote_field', None) or getattr(field, 'rel', None)
+    if remote_field is None:
+        return None
+    return getattr(remote_field, 'model', None) or getattr(remote_field, 'to', None)
+
+
+def suggest_select_related(model, shapes):
+    """
+    Return the names of the foreign keys of the model to the tables of the given
+    query shapes
+    """
+    tables = set()
+    for shape in shapes:
+        match = TABLE_RE.search(shape)
+        if match is not None:
+            tables.add(match.group(1))
+    suggestions = []
+    for field in model._meta.fields:
+        related_model = get_related_model(field)
+        if related_model is not None and related_model._meta.db_table in tables:
+            suggestions.append(field.name)
+    return suggestions
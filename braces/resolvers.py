@@ -0,0 +1,98 @@
+"""
+Memoized URL reversing
+
+``reverse_cached()`` reverses each URL name once and keeps the URL as a template, so
+the next calls only fill in the arguments with string formatting instead of walking
+the resolver. It is limited to the URLs without arguments or with non negative
+integer arguments (like primary keys), other calls are given to ``reverse()``.
+
+The templates are kept for the current resolver, URLconf and script prefix, they
+are not used anymore once the URLconf is reloaded (``clear_url_caches()``) or the
+``ROOT_URLCONF`` setting is changed.
+"""
+import re
+
+from django.core.urlresolvers import (NoReverseMatch, get_resolver, get_script_prefix,
+                                      get_urlconf, reverse)
+try:
+    from django.core.signals import setting_changed
+except ImportError:  # Django < 1.8
+    from django.test.signals import setting_changed
+
+DIGITS_RE = re.compile(r'^[0-9]+\Z')
+
+# Numbers too long for the patterns of bounded integers
+SENTINEL = '19283746501928374650%d'
+
+_templates = {}
+
+
+def clear_reverse_cache():
+    _templates.clear()
+
+
+def _setting_changed(sender, setting, **kwargs):
+    if setting == 'ROOT_URLCONF':
+        clear_reverse_cache()
+
+
+setting_changed.connect(_setting_changed, dispatch_uid='braces_resolvers_setting_changed')
+
+
+def is_cacheable_value(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, long)):
+        return value >= 0
+    return isinstance(value, basestring) and DIGITS_RE.match(value) is not None
+
+
+def build_template(viewname, args, kwargs, urlconf, current_app):
+    """
+    Return the URL template for the arguments names, or None if the URL can not be
+    built from a template
+    """
+    names = [str(position) for position in range(len(args))] + sorted(kwargs)
+    sentinels = dict([(name, SENTINEL % position) for position, name in enumerate(names)])
+    try:
+        url = reverse(viewname, urlconf=urlconf, current_app=current_app,
+                      args=[sentinels[name] for name in names[:len(args)]],
+                      kwargs=dict([(name, sentinels[name]) for name in kwargs]))
+    except NoReverseMatch:
+        return None
+    template = url.replace('%', '%%')
+    for name, sentinel in sentinels.items():
+        if template.count(sentinel) != 1:
+            return None
+        template = template.replace(sentinel, '%%(%s)s' % name)
+    return template
+
+
+def reverse_cached(viewname, args=None, kwargs=None, urlconf=None, current_app=None):
+    """
+    Like ``reverse()`` but memoizing the URL templates
+    """
+    args = args or ()
+    kwargs = kwargs or {}
+    values = list(args) + list(kwargs.values())
+    if not isinstance(viewname, basestring) or not all(map(is_cacheable_value, values)):
+        return reverse(viewname, urlconf=urlconf, args=args, kwargs=kwargs,
+                       current_app=current_app)
+
+    if urlconf is None:
+        urlconf = get_urlconf()
+    key = (viewname, len(args), tuple(sorted(kwargs)), urlconf, current_app,
+           get_script_prefix())
+    resolver = get_resolver(urlconf)
+    entry = _templates.get(key)
+    if entry is None or entry[0] is not resolver:
+        entry = (resolver, build_template(viewname, args, kwargs, urlconf, current_app))
+        _templates[key] = entry
+
+    template = entry[1]
+    if template is None:
+        return reverse(viewname, urlconf=urlconf, args=args, kwargs=kwargs,
+                       current_app=current_app)
+    params = dict([(str(position), value) for position, value in enumerate(args)])
+    params.update(kwargs)
+    return template % params
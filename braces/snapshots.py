@@ -0,0 +1,88 @@
+"""
+Compact signed snapshots of the user authorization data
+
+A snapshot holds the user id, its active, staff and superuser flags and its
+permissions as a bitset over the sorted list of all the permissions. It is signed
+and timestamped with ``django.core.signing`` so it can be stored in a cookie, and
+bound to the permission version of ``braces.permissions`` so it is not valid
+anymore once permissions have changed.
+"""
+from django.contrib.auth.models import Permission
+from django.core import signing
+
+from braces.permissions import (VERSION_TIMEOUT, get_permission_cache,
+                                get_permission_version)
+
+SALT = 'braces.snapshots'
+
+
+def get_permission_index(version=None):
+    """
+    Return the sorted list of all the permission names, cached for the permission
+    version
+    """
+    if version is None:
+        version = get_permission_version()
+    cache = get_permission_cache()
+    key = 'braces.snapshots.index.%s' % version
+    index = cache.get(key)
+    if index is None:
+        index = sorted(['%s.%s' % permission for permission in
+                        Permission.objects.values_list('content_type__app_label',
+                                                       'codename')])
+        cache.set(key, index, VERSION_TIMEOUT)
+    return index
+
+
+def encode_permissions(perms, index):
+    bits = 0
+    for position, name in enumerate(index):
+        if name in perms:
+            bits |= 1 << position
+    return '%x' % bits
+
+
+def decode_permissions(bits, index):
+    bits = int(bits, 16)
+    return frozenset([name for position, name in enumerate(index)
+                      if bits & (1 << position)])
+
+
+def build_snapshot(user):
+    version = get_permission_version()
+    snapshot = {
+        'u': str(user.pk),
+        'v': version,
+        'a': bool(user.is_active),
+        's': bool(getattr(user, 'is_staff', False)),
+        'su': bool(getattr(user, 'is_superuser', False)),
+        'p': '0',
+    }
+    if snapshot['a'] and not snapshot['su']:
+        snapshot['p'] = encode_permissions(user.get_all_permissions(),
+                                           get_permission_index(version))
+    return snapshot
+
+
+def dumps_snapshot(snapshot):
+    return signing.dumps(snapshot, salt=SALT, compress=True)
+
+
+def loads_snapshot(value, user_id, max_age):
+    """
+    Return the snapshot from its signed value if it is valid and fresh, and for the
+    given user id, else None
+    """
+    try:
+        snapshot = signing.loads(value, salt=SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('u') != str(user_id):
+        return None
+    if snapshot.get('v') != get_permission_version():
+        return None
+    return snapshot
+
+
+def get_snapshot_permissions(snapshot):
+    return decode_permissions(snapshot['p'], get_permission_index(snapshot['v']))
@@ -1,22 +1,124 @@
-import datetime, json
+import calendar, csv, datetime, decimal, hashlib, itertools, json, logging, os, re, tempfile, zlib
+from xml.sax.saxutils import escape as xml_escape
 
 from django.conf import settings
-from django.contrib.auth import REDIRECT_FIELD_NAME
+from django.contrib.auth import REDIRECT_FIELD_NAME, SESSION_KEY
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import redirect_to_login
 from django.core import serializers
-from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied, ValidationError
+from django.core.paginator import InvalidPage, Paginator
 from django.core.serializers.json import DjangoJSONEncoder
-from django.core.urlresolvers import reverse
+from django.db import DEFAULT_DB_ALIAS, connections, router
+try:
+    from django.db.transaction import atomic
+except ImportError:  # Django < 1.6
+    from django.db.transaction import commit_on_success as atomic
 from django.utils import simplejson as json
-from django.http import HttpResponse, HttpResponseRedirect, Http404
+from django.http import (HttpResponse, HttpResponseBadRequest, HttpResponseNotModified,
+    HttpResponseRedirect, Http404)
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:  # Django < 1.5, plain responses can consume iterators
+    StreamingHttpResponse = HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
-from django.utils.http import urlquote
+from django.utils.crypto import constant_time_compare
+from django.utils.datastructures import MultiValueDict
+from django.utils.encoding import smart_str
+try:
+    from django.utils.encoding import force_text
+except ImportError:  # Django < 1.5
+    from django.utils.encoding import force_unicode as force_text
+from django.utils.http import (http_date, parse_http_date_safe, quote_etag, urlencode,
+    urlquote)
+from django.utils.translation import ugettext as _
 from django.views.generic import CreateView
 from django.views.generic.base import TemplateResponseMixin, View
-from django.views.generic.list import BaseListView
+from django.views.generic.list import BaseListView, MultipleObjectMixin
 from django.views.generic.edit import BaseDeleteView, FormMixin
 
+from braces.forms import BulkFormSet, bulk_formset_factory
+from braces.caching import LRUCache, default_flight, get_cache_backend
+from braces import jsonbackends
+from braces import permissions, snapshots
+from braces.paginators import CountPaginator, KeysetPaginator
+from braces.exports import get_default_executor, get_default_store, make_export_key
+from braces.resolvers import reverse_cached
+from braces.queries import (QueryBudgetExceeded, QueryRecorder, get_related_model,
+    suggest_select_related)
+
+
+def get_compiled_attribute(view, name, compile):
+    """
+    Return the value of a view configuration attribute as compiled (and validated) 
+    by the ``compile`` callable
+    
+    The compiled value is cached on the view class, so it is done once per class 
+    instead of on every request. It is compiled again if the attribute value is not 
+    the same object anymore (like when given to ``as_view()``).
+    """
+    value = getattr(view, name)
+    cls = view.__class__
+    compiled_attributes = cls.__dict__.get('_compiled_attributes')
+    if compiled_attributes is None:
+        compiled_attributes = {}
+        cls._compiled_attributes = compiled_attributes
+    entry = compiled_attributes.get(name)
+    if entry is None or entry[0] is not value:
+        entry = (value, compile(value))
+        compiled_attributes[name] = entry
+    return entry[1]
+
+
+def is_pk_ordered(queryset):
+    """
+    Return True if the queryset is not sliced and not ordered on something else than 
+    its primary key (ascending)
+    """
+    query = queryset.query
+    if query.low_mark or query.high_mark is not None:
+        return False
+    ordering = list(query.order_by or (query.default_ordering and
+                                       queryset.model._meta.ordering) or [])
+    pk = queryset.model._meta.pk
+    return ordering in ([], ['pk'], [pk.name], [pk.attname])
+
+
+def queryset_iterator(queryset, chunk_size):
+    """
+    Iterate over a queryset without caching its results, by chunks of ``chunk_size`` 
+    rows each fetched with its own query on a range of primary keys
+    
+    Database drivers fetch all the rows of a query in memory, even with 
+    ``iterator()``, so this keeps the memory usage bounded. It works for querysets of 
+    model instances, ``values()`` and ``values_list()``. Sliced querysets and querysets 
+    ordered on something else than the primary key are read with a single 
+    ``iterator()`` query.
+    """
+    if not is_pk_ordered(queryset):
+        for row in queryset.iterator():
+            yield row
+        return
+    queryset = queryset.order_by('pk')
+    pks = queryset.values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        chunk, chunk_pks = queryset, pks
+        if last_pk is not None:
+            chunk = queryset.filter(pk__gt=last_pk)
+            chunk_pks = pks.filter(pk__gt=last_pk)
+        # The last primary key of the chunk, if there is a complete chunk left
+        boundary = list(chunk_pks[chunk_size - 1:chunk_size])
+        if not boundary:
+            for row in chunk.iterator():
+                yield row
+            return
+        last_pk = boundary[0]
+        for row in chunk.filter(pk__lte=last_pk).iterator():
+            yield row
+
 class CreateAndRedirectToEditView(CreateView):
     """
     Subclass of CreateView which redirects to the edit view.
@@ -30,7 +132,7 @@ class CreateAndRedirectToEditView(CreateView):
         # If one is, we reverse it and finish running the method,
         # otherwise we raise a configuration error.
         if self.success_url_name:
-            self.success_url = reverse(self.success_url_name,
+            self.success_url = reverse_cached(self.success_url_name,
                 kwargs={'pk': self.object.pk})
             return super(CreateAndRedirectToEditView, self).get_success_url()
 
@@ -38,7 +140,75 @@ class CreateAndRedirectToEditView(CreateView):
             "No URL to reverse. Provide a success_url_name.")
 
 
-class LoginRequiredMixin(object):
+class AuthSnapshotMixin(object):
+    """
+    Mixin to check the user authorization against a snapshot instead of loading the 
+    user and its permissions from the database on every request.
+    
+    With "auth_snapshot" set to "session" or "cookie", a compact signed snapshot of 
+    the user flags and permissions (see ``braces.snapshots``) is stored in the session 
+    or in a cookie and used for "auth_snapshot_ttl" seconds. The user is only loaded 
+    again when the snapshot is missing, expired, for another user or when permissions 
+    have changed since it was made.
+    """
+    auth_snapshot = None
+    auth_snapshot_ttl = 300
+    auth_snapshot_cookie_name = 'braces_auth'
+    auth_snapshot_session_key = '_braces_auth'
+    
+    def get_auth_snapshot(self):
+        """
+        Return the snapshot for the request user or None if the user is anonymous
+        """
+        request = self.request
+        if '_braces_auth_snapshot' in request.__dict__:
+            return request._braces_auth_snapshot
+        snapshot = None
+        session = getattr(request, 'session', None)
+        user_id = session.get(SESSION_KEY) if session is not None else None
+        if user_id is not None:
+            if self.auth_snapshot == 'session':
+                value = session.get(self.auth_snapshot_session_key)
+            else:
+                value = request.COOKIES.get(self.auth_snapshot_cookie_name)
+            if value:
+                snapshot = snapshots.loads_snapshot(value, user_id, self.auth_snapshot_ttl)
+            if snapshot is None and request.user.is_authenticated():
+                # Load the user from the database to make a new snapshot
+                snapshot = snapshots.build_snapshot(request.user)
+                request._braces_auth_snapshot_value = snapshots.dumps_snapshot(snapshot)
+        request._braces_auth_snapshot = snapshot
+        return snapshot
+    
+    def store_auth_snapshot(self, response):
+        """
+        Store the snapshot made for the request, if any, and return the response
+        """
+        value = self.request.__dict__.pop('_braces_auth_snapshot_value', None)
+        if value is None:
+            return response
+        if self.auth_snapshot == 'session':
+            self.request.session[self.auth_snapshot_session_key] = value
+        else:
+            response.set_cookie(self.auth_snapshot_cookie_name, value,
+                                max_age=self.auth_snapshot_ttl, httponly=True,
+                                secure=self.request.is_secure())
+        return response
+    
+    def get_user_flag(self, user, name):
+        """
+        Return the "is_active", "is_staff" or "is_superuser" flag of the user, from 
+        the snapshot if it is enabled
+        """
+        if self.auth_snapshot:
+            snapshot = self.get_auth_snapshot()
+            if snapshot is not None:
+                return snapshot[{'is_active': 'a', 'is_staff': 's',
+                                 'is_superuser': 'su'}[name]]
+        return getattr(user, name)
+
+
+class LoginRequiredMixin(AuthSnapshotMixin):
     """
     View mixin which verifies that the user has authenticated.
 
@@ -46,8 +216,16 @@ class LoginRequiredMixin(object):
         This should be the left-most mixin of a view.
     """
 
-    @method_decorator(login_required)
     def dispatch(self, request, *args, **kwargs):
+        if self.auth_snapshot and self.get_auth_snapshot() is not None:
+            # The user is authenticated, there is no need to load it
+            response = super(LoginRequiredMixin, self).dispatch(request,
+                *args, **kwargs)
+            return self.store_auth_snapshot(response)
+        return self._login_required_dispatch(request, *args, **kwargs)
+
+    @method_decorator(login_required)
+    def _login_required_dispatch(self, request, *args, **kwargs):
         return super(LoginRequiredMixin, self).dispatch(request,
             *args, **kwargs)
 
@@ -75,7 +253,78 @@ class AnonymousRequiredMixin(object):
         return super(AnonymousRequiredMixin, self).post(*args, **kwargs)
 
 
-class PermissionRequiredMixin(object):
+class PermissionCacheMixin(AuthSnapshotMixin):
+    """
+    Mixin memoizing the permission checks of the user for the request, shared by all 
+    the permission mixins of a view.
+    
+    With "permission_cache" set to True, checks are also cached across requests for 
+    "permission_cache_timeout" seconds, see ``braces.permissions``.
+    """
+    permission_cache = False
+    permission_cache_timeout = 300
+    batch_permissions = True
+    
+    def cached_permission_check(self, user, name, check):
+        """
+        Return the result of the ``check`` callable for the user, cached under 
+        ``name``
+        """
+        memo = self.request.__dict__.setdefault('_braces_permissions', {})
+        memo_key = (user.pk, name)
+        if memo_key not in memo:
+            if self.permission_cache and user.pk is not None:
+                cache = permissions.get_permission_cache()
+                key = permissions.get_permission_cache_key(user, name)
+                result = cache.get(key)
+                if result is None:
+                    result = check()
+                    cache.set(key, result, self.permission_cache_timeout)
+            else:
+                result = check()
+            memo[memo_key] = result
+        return memo[memo_key]
+    
+    def user_has_perm(self, user, perm):
+        return self.cached_permission_check(user, u'perm:%s' % perm,
+                                            lambda: user.has_perm(perm))
+    
+    def get_user_permissions(self, user):
+        """
+        Return the set of all the permissions of the user, fetched at once from the 
+        authentication backends
+        """
+        return self.cached_permission_check(user, u'all',
+                                            lambda: frozenset(user.get_all_permissions()))
+    
+    def get_permission_checker(self, user):
+        """
+        Return a callable checking if the user has a permission
+        
+        With "batch_permissions" (the default) it checks against the set of all the 
+        user permissions so a single backend call is done for any number of checks, 
+        else each permission is checked with ``user.has_perm()`` (needed for backends 
+        implementing only ``has_perm()``).
+        """
+        if self.auth_snapshot:
+            snapshot = self.get_auth_snapshot()
+            if snapshot is not None:
+                if snapshot['a'] and snapshot['su']:
+                    return lambda perm: True
+                if not snapshot['a']:
+                    return lambda perm: False
+                return snapshots.get_snapshot_permissions(snapshot).__contains__
+        if not self.batch_permissions:
+            return lambda perm: self.user_has_perm(user, perm)
+        if user.is_active and user.is_superuser:
+            return lambda perm: True
+        if not user.is_active and user.pk is not None:
+            # Like Django's backend, inactive users have no permissions
+            return lambda perm: False
+        return self.get_user_permissions(user).__contains__
+
+
+class PermissionRequiredMixin(PermissionCacheMixin):
     """
     View mixin which verifies that the logged in user has the specified
     permission.
@@ -104,17 +353,27 @@ class PermissionRequiredMixin(object):
     raise_exception = False  # Default whether to raise an exception to none
     redirect_field_name = REDIRECT_FIELD_NAME  # Set by django.contrib.auth
 
-    def dispatch(self, request, *args, **kwargs):
+    def _compile_permission_required(self, permission_required):
         # Make sure that a permission_required is set on the view,
         # and if it is, that it only has two parts (app.action_model)
         # or raise a configuration error.
-        if self.permission_required == None or len(
-            self.permission_required.split(".")) != 2:
+        if permission_required == None or len(
+            permission_required.split(".")) != 2:
             raise ImproperlyConfigured("'PermissionRequiredMixin' requires "
                 "'permission_required' attribute to be set.")
+        return permission_required
+
+    def dispatch(self, request, *args, **kwargs):
+        # The configuration is only checked on the first request of the class
+        permission_required = get_compiled_attribute(self, 'permission_required',
+                                                     self._compile_permission_required)
 
         # Check to see if the request's user has the required permission.
-        has_permission = request.user.has_perm(self.permission_required)
+        if self.auth_snapshot:
+            has_permission = self.get_permission_checker(request.user)(
+                permission_required)
+        else:
+            has_permission = self.user_has_perm(request.user, permission_required)
 
         if not has_permission:  # If the user lacks the permission
             if self.raise_exception:  # *and* if an exception was desired
@@ -124,11 +383,12 @@ class PermissionRequiredMixin(object):
                                          self.login_url,
                                          self.redirect_field_name)
 
-        return super(PermissionRequiredMixin, self).dispatch(request,
+        response = super(PermissionRequiredMixin, self).dispatch(request,
             *args, **kwargs)
+        return self.store_auth_snapshot(response)
 
 
-class MultiplePermissionsRequiredMixin(object):
+class MultiplePermissionsRequiredMixin(PermissionCacheMixin):
     """
     View mixin which allows you to specify two types of permission
     requirements. The `permissions` attribute must be a dict which
@@ -143,6 +403,14 @@ class MultiplePermissionsRequiredMixin(object):
     By specifying The `any` key , the user must have ONE of the set
     permissions in the list.
 
+    By specifying the `not` key, the user must NOT have the permission (or
+    any of the permissions if it is a list or tuple).
+
+    Items of the lists can also be nested dicts with the same keys, like
+    {"all": ("blog.add_post", {"any": ("blog.publish", "blog.review")})}.
+    The whole expression is evaluated against the set of the user
+    permissions fetched at once, see `PermissionCacheMixin`.
+
     Class Settings
         `permissions` - This is required to be a dict with one or both
             keys of `all` and/or `any` containing a list or tuple of
@@ -170,42 +438,41 @@ class MultiplePermissionsRequiredMixin(object):
     raise_exception = False  # Default whether to raise an exception to none
     redirect_field_name = REDIRECT_FIELD_NAME  # Set by django.contrib.auth
 
-    def dispatch(self, request, *args, **kwargs):
+    def _compile_permissions(self, perms):
         self._check_permissions_attr()
 
-        perms_all = self.permissions.get('all') or None
-        perms_any = self.permissions.get('any') or None
+        perms_all = perms.get('all') or None
+        perms_any = perms.get('any') or None
+        perms_not = perms.get('not') or None
 
-        self._check_permissions_keys_set(perms_all, perms_any)
+        self._check_permissions_keys_set(perms_all, perms_any, perms_not)
         self._check_perms_keys("all", perms_all)
         self._check_perms_keys("any", perms_any)
 
-        # If perms_all, check that user has all permissions in the list/tuple
-        if perms_all:
-            if not request.user.has_perms(perms_all):
-                if self.raise_exception:
-                    raise PermissionDenied
-                return redirect_to_login(request.get_full_path(),
-                                         self.login_url,
-                                         self.redirect_field_name)
-
-        # If perms_any, check that user has at least one in the list/tuple
-        if perms_any:
-            has_one_perm = False
-            for perm in perms_any:
-                if request.user.has_perm(perm):
-                    has_one_perm = True
-                    break
+        # Like unset keys, empty keys have no requirements
+        return permissions.compile_permissions(dict([
+            (key, value) for key, value in (('all', perms_all), ('any', perms_any),
+                                            ('not', perms_not))
+            if value is not None]))
 
-            if not has_one_perm:
-                if self.raise_exception:
-                    raise PermissionDenied
-                return redirect_to_login(request.get_full_path(),
-                                         self.login_url,
-                                         self.redirect_field_name)
-
-        return super(MultiplePermissionsRequiredMixin, self).dispatch(request,
+    def dispatch(self, request, *args, **kwargs):
+        # The configuration is only checked and compiled on the first request of
+        # the class
+        expression = get_compiled_attribute(self, 'permissions',
+                                            self._compile_permissions)
+
+        # Evaluate the whole expression against the user permissions
+        has_perm = self.get_permission_checker(request.user)
+        if not permissions.evaluate_permissions(expression, has_perm):
+            if self.raise_exception:
+                raise PermissionDenied
+            return redirect_to_login(request.get_full_path(),
+                                     self.login_url,
+                                     self.redirect_field_name)
+
+        response = super(MultiplePermissionsRequiredMixin, self).dispatch(request,
             *args, **kwargs)
+        return self.store_auth_snapshot(response)
 
     def _check_permissions_attr(self):
         """
@@ -215,16 +482,17 @@ class MultiplePermissionsRequiredMixin(object):
             raise ImproperlyConfigured("'PermissionsRequiredMixin' requires "
                 "'permissions' attribute to be set to a dict.")
 
-    def _check_permissions_keys_set(self, perms_all=None, perms_any=None):
+    def _check_permissions_keys_set(self, perms_all=None, perms_any=None,
+                                    perms_not=None):
         """
-        Check to make sure the keys `any` or `all` are not both blank.
-        If both are blank either an empty dict came in or the wrong keys
+        Check to make sure the keys `any`, `all` or `not` are not all blank.
+        If they are all blank either an empty dict came in or the wrong keys
         came in. Both are invalid and should raise an exception.
         """
-        if perms_all is None and perms_any is None:
+        if perms_all is None and perms_any is None and perms_not is None:
             raise ImproperlyConfigured("'PermissionsRequiredMixin' requires"
-                "'permissions' attribute to be set to a dict and the 'any' "
-                "or 'all' key to be set.")
+                "'permissions' attribute to be set to a dict and the 'any', "
+                "'all' or 'not' key to be set.")
 
     def _check_perms_keys(self, key=None, perms=None):
         """
@@ -263,10 +531,10 @@ class SuccessURLRedirectListMixin(object):
 
     def get_success_url(self):
         # Return the reversed success url.
-        return reverse(self.success_list_url)
+        return reverse_cached(self.success_list_url)
 
 
-class SuperuserRequiredMixin(object):
+class SuperuserRequiredMixin(AuthSnapshotMixin):
     """
     Mixin allows you to require a user with `is_superuser` set to True.
     """
@@ -275,7 +543,8 @@ class SuperuserRequiredMixin(object):
     redirect_field_name = REDIRECT_FIELD_NAME  # Set by django.contrib.auth
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_superuser:  # If the user is a standard user,
+        # If the user is a standard user,
+        if not self.get_user_flag(request.user, 'is_superuser'):
             if self.raise_exception:  # *and* if an exception was desired
                 raise PermissionDenied  # return a forbidden response.
             else:
@@ -283,8 +552,9 @@ class SuperuserRequiredMixin(object):
                                          self.login_url,
                                          self.redirect_field_name)
 
-        return super(SuperuserRequiredMixin, self).dispatch(request,
+        response = super(SuperuserRequiredMixin, self).dispatch(request,
             *args, **kwargs)
+        return self.store_auth_snapshot(response)
 
 
 class SetHeadlineMixin(object):
@@ -318,26 +588,186 @@ class SelectRelatedMixin(object):
     """
     select_related = None  # Default related fields to none
 
-    def get_queryset(self):
-        if self.select_related is None:  # If no fields were provided,
-                                         # raise a configuration error
+    def _compile_select_related(self, select_related):
+        if select_related is None:  # If no fields were provided,
+                                    # raise a configuration error
             raise ImproperlyConfigured(u"%(cls)s is missing the "
                 "select_related property. This must be a tuple or list." % {
                     "cls": self.__class__.__name__})
 
-        if not isinstance(self.select_related, (tuple, list)):
+        if not isinstance(select_related, (tuple, list)):
             # If the select_related argument is *not* a tuple or list,
             # raise a configuration error.
             raise ImproperlyConfigured(u"%(cls)s's select_related property "
                 "must be a tuple or list." % {"cls": self.__class__.__name__})
+        return tuple(select_related)
+
+    def get_queryset(self):
+        # The configuration is only checked on the first request of the class
+        select_related = get_compiled_attribute(self, 'select_related',
+                                                self._compile_select_related)
 
         # Get the current queryset of the view
         queryset = super(SelectRelatedMixin, self).get_queryset()
 
-        return queryset.select_related(*self.select_related)
+        return queryset.select_related(*select_related)
+
+
+class PrefetchRelatedMixin(object):
+    """
+    Mixin allows you to provide a tuple or list of related lookups to perform a 
+    prefetch_related on, for reverse foreign keys and many to many relations.
+    """
+    prefetch_related = None  # Default related lookups to none
+
+    def _compile_prefetch_related(self, prefetch_related):
+        if prefetch_related is None:  # If no lookups were provided,
+                                      # raise a configuration error
+            raise ImproperlyConfigured(u"%(cls)s is missing the "
+                "prefetch_related property. This must be a tuple or list." % {
+                    "cls": self.__class__.__name__})
+
+        if not isinstance(prefetch_related, (tuple, list)) or not all(
+                isinstance(lookup, basestring) for lookup in prefetch_related):
+            raise ImproperlyConfigured(u"%(cls)s's prefetch_related property "
+                "must be a tuple or list of lookups." % {"cls": self.__class__.__name__})
+        return tuple(prefetch_related)
+
+    def get_queryset(self):
+        # The configuration is only checked on the first request of the class
+        prefetch_related = get_compiled_attribute(self, 'prefetch_related',
+                                                  self._compile_prefetch_related)
+
+        # Get the current queryset of the view
+        queryset = super(PrefetchRelatedMixin, self).get_queryset()
+
+        return queryset.prefetch_related(*prefetch_related)
+
+
+class RelatedLoadingMixin(object):
+    """
+    Mixin to plan the loading of the queryset : "select_related" and 
+    "prefetch_related" lookups, and the "only_fields" or "defer_fields" column 
+    restrictions. They are all optional tuples or lists of strings.
+    
+    Each option can be overridden for a request method or for ajax requests with an 
+    attribute suffixed by the lowercase method name or "ajax", like 
+    "prefetch_related_post" or "only_fields_ajax" (the ajax ones come first).
+    """
+    select_related = None
+    prefetch_related = None
+    only_fields = None
+    defer_fields = None
+    loading_options = (
+        ('select_related', 'select_related'),
+        ('prefetch_related', 'prefetch_related'),
+        ('only_fields', 'only'),
+        ('defer_fields', 'defer'),
+    )
+
+    def get_loading_option_name(self, name):
+        """
+        Return the name of the attribute to use for a loading option and the 
+        current request
+        """
+        suffixes = [self.request.method.lower()]
+        if self.request.is_ajax():
+            suffixes.insert(0, 'ajax')
+        for suffix in suffixes:
+            override = '%s_%s' % (name, suffix)
+            if getattr(self, override, None) is not None:
+                return override
+        return name
+
+    def _compile_loading_option(self, value):
+        if not isinstance(value, (tuple, list)) or not all(
+                isinstance(item, basestring) for item in value):
+            raise ImproperlyConfigured(u"%(cls)s's related loading options must be "
+                "tuples or lists of strings, got %(value)r." % {
+                    "cls": self.__class__.__name__, "value": value})
+        return tuple(value)
+
+    def get_queryset(self):
+        queryset = super(RelatedLoadingMixin, self).get_queryset()
+        for name, method in self.loading_options:
+            name = self.get_loading_option_name(name)
+            if getattr(self, name, None) is None:
+                continue
+            # The configuration is only checked on the first request of the class
+            value = get_compiled_attribute(self, name, self._compile_loading_option)
+            if value:
+                queryset = getattr(queryset, method)(*value)
+        return queryset
+
+
+class QueryBudgetMixin(object):
+    """
+    Mixin counting the database queries run by the view to catch N+1 queries
+    
+    Queries are recorded during "dispatch", with "query_budget_render" template 
+    responses are rendered within it to also count the template queries (they are 
+    then rendered before the response middlewares run). The same query run at least 
+    "n_plus_one_threshold" times is reported as a probable N+1, with the foreign keys 
+    of the view model to suggest for "select_related".
+    
+    "query_budget_action" is what to do when the "max_queries" budget is exceeded or 
+    N+1 queries are found : "log" a warning, add "header" with the queries count 
+    (and log), or "raise" a ``QueryBudgetExceeded`` error when the budget is exceeded 
+    (for tests).
+    """
+    max_queries = None
+    n_plus_one_threshold = 5
+    query_budget_action = 'log'
+    query_budget_header = 'X-Query-Count'
+    query_budget_using = DEFAULT_DB_ALIAS
+    query_budget_render = False
+    
+    def dispatch(self, request, *args, **kwargs):
+        with QueryRecorder(self.query_budget_using) as recorder:
+            response = super(QueryBudgetMixin, self).dispatch(request, *args, **kwargs)
+            if (self.query_budget_render and hasattr(response, 'render')
+                    and not getattr(response, 'is_rendered', True)):
+                response.render()
+        return self.check_query_budget(recorder, response)
+    
+    def get_query_budget_model(self):
+        model = getattr(self, 'model', None)
+        if model is None and getattr(self, 'queryset', None) is not None:
+            model = self.queryset.model
+        return model
+    
+    def check_query_budget(self, recorder, response):
+        """
+        Report the budget overrun and N+1 queries, and return the response
+        """
+        count = len(recorder)
+        if self.query_budget_action == 'header':
+            response[self.query_budget_header] = str(count)
+        exceeded = self.max_queries is not None and count > self.max_queries
+        repeated = recorder.get_repeated_queries(self.n_plus_one_threshold)
+        if not exceeded and not repeated:
+            return response
+        
+        messages = [u"%s ran %d queries" % (self.__class__.__name__, count)]
+        if exceeded:
+            messages.append(u"for a budget of %d" % self.max_queries)
+        for shape, shape_count in repeated:
+            messages.append(u"probable N+1, %d times : %s" % (shape_count, shape))
+        model = self.get_query_budget_model()
+        if repeated and model is not None:
+            suggestions = suggest_select_related(model, [shape for shape, shape_count in repeated])
+            if suggestions:
+                messages.append(u"try select_related(%s)" % ", ".join(
+                    [repr(str(name)) for name in suggestions]))
+        message = u"; ".join(messages)
+        
+        if exceeded and self.query_budget_action == 'raise':
+            raise QueryBudgetExceeded(message)
+        logging.getLogger('braces').warning(message)
+        return response
 
 
-class StaffuserRequiredMixin(object):
+class StaffuserRequiredMixin(AuthSnapshotMixin):
     """
     Mixin allows you to require a user with `is_staff` set to True.
     """
@@ -346,7 +776,8 @@ class StaffuserRequiredMixin(object):
     redirect_field_name = REDIRECT_FIELD_NAME  # Set by django.contrib.auth
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_staff:  # If the request's user is not staff,
+        # If the request's user is not staff,
+        if not self.get_user_flag(request.user, 'is_staff'):
             if self.raise_exception:  # *and* if an exception was desired
                 raise PermissionDenied  # return a forbidden response
             else:
@@ -354,11 +785,198 @@ class StaffuserRequiredMixin(object):
                                          self.login_url,
                                          self.redirect_field_name)
 
-        return super(StaffuserRequiredMixin, self).dispatch(request,
+        response = super(StaffuserRequiredMixin, self).dispatch(request,
             *args, **kwargs)
+        return self.store_auth_snapshot(response)
+
 
+GZIP_ACCEPT_RE = re.compile(r'\bgzip\b')
 
-class DownloadMixin(object):
+
+def etag_matches(header, etag, weak=True):
+    """
+    Check if the (quoted) ETag is in the value of an "If-None-Match" or "If-Range" 
+    header, weak ETags only match if ``weak`` is True
+    """
+    for value in header.split(','):
+        value = value.strip()
+        if value == '*':
+            return True
+        if value.startswith('W/'):
+            if not weak:
+                continue
+            value = value[2:]
+        if value == etag:
+            return True
+    return False
+
+
+def gzip_string(value, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(value) + compressor.flush()
+
+
+def compress_sequence(sequence, level=6):
+    """
+    Incrementally gzip compress a sequence of strings
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for item in sequence:
+        if not isinstance(item, bytes):
+            item = item.encode('utf-8')
+        data = compressor.compress(item)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class GZipResponseMixin(object):
+    """
+    Mixin to gzip compress the responses when the client accepts it, including 
+    streaming responses which are compressed chunk by chunk
+    
+    Compression is enabled with "gzip_content", only for the content types starting 
+    with one of "gzip_content_types" and for contents of at least "gzip_min_length" 
+    bytes (the size of streamed contents is unknown, so they are always compressed). 
+    With Django < 1.5, which has no streaming responses, streamed contents are never 
+    compressed.
+    """
+    gzip_content = False
+    gzip_level = 6
+    gzip_min_length = 200
+    gzip_content_types = ('text/', 'application/json', 'application/javascript',
+                          'application/xml', 'application/x-ndjson',
+                          'application/vnd.ms-excel', 'application/ms-excel')
+    
+    def should_compress_response(self, response):
+        if not self.gzip_content or response.status_code != 200:
+            return False
+        if response.has_header('Content-Encoding'):
+            return False
+        if getattr(response, '_base_content_is_iter', False):
+            # Iterator content of a plain response (Django < 1.5), reading it would
+            # load all of it in memory
+            return False
+        if not GZIP_ACCEPT_RE.search(self.request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        for allowed in self.gzip_content_types:
+            if content_type == allowed or (allowed.endswith('/') and content_type.startswith(allowed)):
+                break
+        else:
+            return False
+        if not getattr(response, 'streaming', False):
+            return len(response.content) >= self.gzip_min_length
+        return True
+    
+    def compress_response(self, response):
+        """
+        Compress the response if it should be and return it
+        """
+        if not self.gzip_content:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not self.should_compress_response(response):
+            return response
+        if getattr(response, 'streaming', False):
+            response.streaming_content = compress_sequence(response.streaming_content,
+                                                           self.gzip_level)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            compressed = gzip_string(response.content, self.gzip_level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        # The compressed content is not byte to byte the same anymore
+        if response.has_header('ETag') and not response['ETag'].startswith('W/'):
+            response['ETag'] = 'W/' + response['ETag']
+        if response.has_header('Accept-Ranges'):
+            del response['Accept-Ranges']
+        response['Content-Encoding'] = 'gzip'
+        return response
+
+
+RANGE_RE = re.compile(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$', re.I)
+
+
+class ContentIterator(object):
+    """
+    Iterate over a downloadable content by chunks of ``chunk_size`` bytes
+
+    The content can be a string, a file object (anything with a ``read()`` method) or
+    any iterable of strings. The given ``close_callback`` is called exactly once, when
+    the iteration is exhausted or when ``close()`` is called by the server (like when
+    the client has disconnected before the end).
+
+    ``start`` and ``length`` limit the iteration to a bytes range of a string or file 
+    content, text strings are encoded with the ``DEFAULT_CHARSET`` to iterate over 
+    their bytes.
+    """
+    def __init__(self, content, chunk_size, close_callback=None, start=0, length=None):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.close_callback = close_callback
+        self.start = start
+        self.length = length
+        self._closed = False
+        self._iterator = self._chunks()
+
+    def _chunks(self):
+        content = self.content
+        if isinstance(content, unicode):
+            content = content.encode(settings.DEFAULT_CHARSET)
+        if isinstance(content, basestring):
+            end = len(content) if self.length is None else self.start + self.length
+            for start in range(self.start, end, self.chunk_size):
+                yield content[start:min(start + self.chunk_size, end)]
+        elif hasattr(content, 'read'):
+            if self.start:
+                self._skip(content, self.start)
+            remaining = self.length
+            while remaining is None or remaining > 0:
+                size = self.chunk_size if remaining is None else min(self.chunk_size, remaining)
+                chunk = content.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        else:
+            for chunk in content:
+                if chunk:
+                    yield chunk
+
+    def _skip(self, content, offset):
+        if hasattr(content, 'seek'):
+            content.seek(offset)
+            return
+        while offset > 0:
+            chunk = content.read(min(self.chunk_size, offset))
+            if not chunk:
+                break
+            offset -= len(chunk)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.close()
+            raise
+    next = __next__
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            if self.close_callback is not None:
+                self.close_callback()
+
+
+class DownloadMixin(GZipResponseMixin):
     """
     Simple Mixin to send a downloadable content
     
@@ -370,18 +988,39 @@ class DownloadMixin(object):
     * Implementation of ``get_content()`` that return the content to send as downloadable.
     
     If the content is a not a string, it is assumed to be a fileobject to send as 
-    the content with its ``read()`` method.
+    the content with its ``read()`` method, or else an iterable of strings.
     
     Optionnaly implement a ``close_content()`` to close specifics objects linked to 
     content fileobject, if it does not exists a try will be made on a close() method 
     on the content fileobject;
     
+    Responses can be gzip compressed, see ``GZipResponseMixin``.
+    
     A "get_filename_timestamp" method is implemented to return a timestamp to use in your 
     filename if needed, his date format is defined in "timestamp_format" attribute (in a 
     suitable way to use with strftime on a datetime object).
+    
+    If "streaming" attribute is True, the content is not loaded in memory but sent by 
+    chunks of "chunk_size" bytes within a streaming response, the content is closed 
+    once the stream is finished.
+    
+    When the content is a real file on disk, it can be served without copying it 
+    through Python : "sendfile_header" delegates it to the front server (like 
+    "X-Sendfile" or "X-Accel-Redirect"). Only files outliving the request are 
+    delegated, temporary files deleted once closed are sent as usual.
+    
+    Conditional requests are answered with a "304 Not Modified" response without 
+    building the content when "get_etag()" or "get_last_modified()" are implemented, 
+    and partial contents are sent for "Range" requests if "accept_ranges" is True.
     """
     content_type = None
     timestamp_format = "%Y-%m-%d"
+    streaming = False
+    chunk_size = 64 * 1024
+    sendfile_header = getattr(settings, 'BRACES_SENDFILE_HEADER', None)
+    sendfile_root = getattr(settings, 'BRACES_SENDFILE_ROOT', None)
+    sendfile_url = getattr(settings, 'BRACES_SENDFILE_URL', None)
+    accept_ranges = False
     
     def get_filename_timestamp(self):
         return datetime.datetime.now().strftime(self.timestamp_format)
@@ -392,25 +1031,238 @@ class DownloadMixin(object):
     def get_content(self, context):
         raise ImproperlyConfigured("DownloadMixin requires an implementation of 'get_content()' to return the downloadable content")
     
+    def is_streaming(self, context, content):
+        return self.streaming
+    
+    def get_content_path(self, context, content):
+        """
+        Return the absolute path of the content if it is a real file on disk, else 
+        None
+        """
+        if isinstance(content, basestring) or not hasattr(content, 'fileno'):
+            return None
+        name = getattr(content, 'name', None)
+        if not isinstance(name, basestring) or not os.path.isfile(name):
+            return None
+        return os.path.abspath(name)
+    
+    def is_temporary_content(self, context, content):
+        """
+        Return True if the content file is deleted once closed (like a 
+        ``NamedTemporaryFile``), it can not be delegated to the front server since it 
+        is released before the server reads it
+        """
+        for fileobj in (content, getattr(content, 'file', None)):
+            if isinstance(fileobj, tempfile._TemporaryFileWrapper):
+                closer = getattr(fileobj, '_closer', None)
+                return getattr(fileobj, 'delete', getattr(closer, 'delete', True))
+        return False
+    
+    def get_sendfile_path(self, path):
+        """
+        Return the value to give in the "sendfile_header" for the given file path, 
+        or None if the file can not be delegated to the front server
+        
+        Without "sendfile_url" the file path is used as it is (like for "X-Sendfile"), 
+        else the path relative to "sendfile_root" is mapped on "sendfile_url" (like 
+        an internal location for "X-Accel-Redirect").
+        """
+        if self.sendfile_url is None:
+            return path
+        root = os.path.join(os.path.abspath(self.sendfile_root or os.sep), '')
+        if not path.startswith(root):
+            return None
+        relative_path = path[len(root):].replace(os.sep, '/')
+        return self.sendfile_url.rstrip('/') + '/' + urlquote(relative_path)
+    
+    def release_content(self, context, content):
+        """
+        Conditionnal closing of the content object
+        """
+        if hasattr(self, 'close_content'):
+            self.close_content(context, content)
+        elif hasattr(content, 'close'):
+            content.close()
+    
+    def iter_content(self, context, content, start=0, length=None):
+        """
+        Return an iterator on the content chunks which release the content once 
+        finished
+        """
+        return ContentIterator(content, self.chunk_size,
+                               lambda: self.release_content(context, content),
+                               start=start, length=length)
+    
+    def get_last_modified(self, context):
+        """
+        Return the last modification datetime of the content or None if it is unknown
+        
+        This must not need to build the content, it is used to answer conditional 
+        requests before calling ``get_content()``.
+        """
+        return None
+    
+    def get_etag(self, context):
+        """
+        Return the (unquoted) ETag of the content or None if it is unknown
+        
+        Like ``get_last_modified()``, this is called before ``get_content()``.
+        """
+        return None
+    
+    def get_content_size(self, context, content):
+        """
+        Return the content size in bytes if it can be known without reading it, else 
+        None
+        """
+        if isinstance(content, unicode):
+            # The size of the bytes sent by the response
+            return len(content.encode(settings.DEFAULT_CHARSET))
+        if isinstance(content, basestring):
+            return len(content)
+        if hasattr(content, 'fileno'):
+            try:
+                return os.fstat(content.fileno()).st_size
+            except (AttributeError, IOError, OSError, ValueError):
+                pass
+        if hasattr(content, 'size'):
+            # Django File objects
+            try:
+                return content.size
+            except (AttributeError, IOError, OSError, ValueError):
+                pass
+        return None
+    
+    def is_not_modified(self, etag, last_modified):
+        """
+        Check the conditional request headers against the content validators
+        """
+        if_none_match = self.request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return etag is not None and etag_matches(if_none_match, etag)
+        if_modified_since = self.request.META.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since is not None and last_modified is not None:
+            if_modified_since = parse_http_date_safe(if_modified_since)
+            return if_modified_since is not None and last_modified <= if_modified_since
+        return False
+    
+    def get_range(self, etag, last_modified, size):
+        """
+        Return the ``(start, length)`` bytes range asked by the request, None if the 
+        whole content has to be sent or False if the range can not be satisfied
+        
+        Only single ranges are supported, multiple ranges are ignored and the whole 
+        content is sent.
+        """
+        range_header = self.request.META.get('HTTP_RANGE', '')
+        match = RANGE_RE.match(range_header)
+        if match is None:
+            return None
+        if_range = self.request.META.get('HTTP_IF_RANGE')
+        if if_range is not None:
+            if_range = if_range.strip()
+            if if_range.startswith('"') or if_range.startswith('W/'):
+                if etag is None or not etag_matches(if_range, etag, weak=False):
+                    return None
+            elif last_modified is None or parse_http_date_safe(if_range) != last_modified:
+                return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+        if not first:
+            # Suffix range for the last bytes
+            if int(last) == 0:
+                return False
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        if start >= size:
+            return False
+        return (start, end - start + 1)
+    
     def render_to_response(self, context, **response_kwargs):
         if getattr(self, 'content_type', None) is None:
             raise ImproperlyConfigured("DownloadMixin requires a definition of 'content_type' attribute")
-        # Needed headers
-        response = HttpResponse(content_type=self.content_type, **response_kwargs)
-        response['Content-Disposition'] = 'attachment; filename={0}'.format(self.get_filename(context))
-        # Read the content file object or string, append it to response and close it
+        # Conditional request validators
+        etag = self.get_etag(context)
+        if etag is not None:
+            etag = quote_etag(etag)
+        last_modified = self.get_last_modified(context)
+        if last_modified is not None:
+            last_modified = calendar.timegm(last_modified.utctimetuple())
+        if self.is_not_modified(etag, last_modified):
+            response = HttpResponseNotModified()
+            self._set_validators(response, etag, last_modified)
+            return response
+        
+        filename = self.get_filename(context)
         content = self.get_content(context)
-        if isinstance(content, basestring):
-            response.write(content)
+        path = self.get_content_path(context, content)
+        sendfile_path = None
+        if (path is not None and self.sendfile_header
+                and not self.is_temporary_content(context, content)):
+            sendfile_path = self.get_sendfile_path(path)
+        
+        content_range = None
+        size = None
+        if sendfile_path is None and self.accept_ranges:
+            size = self.get_content_size(context, content)
+        if size is not None:
+            content_range = self.get_range(etag, last_modified, size)
+            if content_range is False:
+                self.release_content(context, content)
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */{0}'.format(size)
+                return response
+        start, length = content_range or (0, None)
+        
+        if sendfile_path is not None:
+            # The front server sends the file itself, we just give it the path
+            response = HttpResponse(content_type=self.content_type, **response_kwargs)
+            response[self.sendfile_header] = sendfile_path
+            self.release_content(context, content)
+        elif self.is_streaming(context, content):
+            response = StreamingHttpResponse(self.iter_content(context, content, start, length),
+                                             content_type=self.content_type,
+                                             **response_kwargs)
         else:
-            response.write(content.read())
-        # Conditionnal closing content object
-        if hasattr(self, 'close_content'):
-            self.close_content(context, content)
-        elif hasattr(content, 'close'):
-            content.close()
+            # Read the content file object, string or iterable, append it to 
+            # response and close it
+            response = HttpResponse(content_type=self.content_type, **response_kwargs)
+            try:
+                if content_range is not None:
+                    for chunk in ContentIterator(content, self.chunk_size, start=start, length=length):
+                        response.write(chunk)
+                elif isinstance(content, basestring):
+                    response.write(content)
+                elif hasattr(content, 'read'):
+                    response.write(content.read())
+                else:
+                    for chunk in content:
+                        response.write(chunk)
+            finally:
+                self.release_content(context, content)
+        # Needed headers
+        response['Content-Disposition'] = 'attachment; filename={0}'.format(filename)
+        self._set_validators(response, etag, last_modified)
+        if size is not None:
+            response['Accept-Ranges'] = 'bytes'
+            if content_range is not None:
+                response.status_code = 206
+                response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, start + length - 1, size)
+                response['Content-Length'] = str(length)
             
-        return response
+        return self.compress_response(response)
+    
+    def _set_validators(self, response, etag, last_modified):
+        if etag is not None:
+            response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
 
     def get_context_data(self, **kwargs):
         return {
@@ -453,8 +1305,85 @@ class SimpleListView(TemplateResponseMixin, BaseListView):
     """
     Like generic.ListView but use only ``get_template`` to find template and not an 
     automatic process on ``get_template_names``
+    
+    When "keyset_ordering" is set, the list is paginated with a ``KeysetPaginator`` 
+    on this ordering instead of page numbers. The page is then selected by the 
+    "cursor_kwarg" GET parameter and the page object gets "next_url" and 
+    "previous_url" attributes to link to the pages around.
+    
+    "count_strategy" selects how the page numbers paginator counts the objects : 
+    "exact", "cached" (in the "count_cache_alias" cache backend for 
+    "count_cache_timeout" seconds) or "estimate" (from the database planner over 
+    "count_estimate_threshold" objects), see ``CountPaginator``. Other strategies 
+    than "exact" use a subclass of both ``CountPaginator`` and "paginator_class". A 
+    custom "paginator_class" can not be used with "keyset_ordering".
     """
-    pass
+    keyset_ordering = None
+    keyset_paginator_class = KeysetPaginator
+    cursor_kwarg = 'cursor'
+    count_strategy = 'exact'
+    count_cache_alias = 'default'
+    count_cache_timeout = 300
+    count_estimate_threshold = 10000
+    
+    def get_count_strategy(self):
+        return self.count_strategy
+    
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        count_strategy = self.get_count_strategy()
+        if count_strategy == 'exact':
+            return super(SimpleListView, self).get_paginator(queryset, per_page, orphans=orphans,
+                allow_empty_first_page=allow_empty_first_page, **kwargs)
+        paginator_class = get_compiled_attribute(self, 'paginator_class',
+                                                 self._compile_count_paginator_class)
+        return paginator_class(queryset, per_page, orphans=orphans,
+                               allow_empty_first_page=allow_empty_first_page,
+                               count_strategy=count_strategy,
+                               count_cache=get_cache_backend(self.count_cache_alias),
+                               count_cache_timeout=self.count_cache_timeout,
+                               count_estimate_threshold=self.count_estimate_threshold)
+    
+    def _compile_count_paginator_class(self, paginator_class):
+        """
+        Return a subclass of both ``CountPaginator`` and the paginator class
+        """
+        if issubclass(CountPaginator, paginator_class):
+            return CountPaginator
+        if issubclass(paginator_class, CountPaginator):
+            return paginator_class
+        return type('Count%s' % paginator_class.__name__,
+                    (CountPaginator, paginator_class), {})
+    
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+    
+    def get_cursor_url(self, cursor):
+        """
+        Return the URL of the page for the cursor, keeping the other GET parameters
+        """
+        if cursor is None:
+            return None
+        query = self.request.GET.copy()
+        query[self.cursor_kwarg] = cursor
+        return '?%s' % query.urlencode()
+    
+    def paginate_queryset(self, queryset, page_size):
+        ordering = self.get_keyset_ordering()
+        if not ordering:
+            return super(SimpleListView, self).paginate_queryset(queryset, page_size)
+        if self.paginator_class is not Paginator:
+            raise ImproperlyConfigured(u"%(cls)s can not use a custom paginator_class "
+                "with keyset_ordering, use keyset_paginator_class instead." % {
+                    "cls": self.__class__.__name__})
+        paginator = self.keyset_paginator_class(queryset, page_size, ordering,
+                                                allow_empty_first_page=self.get_allow_empty())
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage:
+            raise Http404(_(u"Invalid cursor"))
+        page.next_url = self.get_cursor_url(page.next_cursor)
+        page.previous_url = self.get_cursor_url(page.previous_cursor)
+        return (paginator, page, page.object_list, page.has_other_pages())
 
 
 class DirectDeleteView(BaseDeleteView):
@@ -467,6 +1396,109 @@ class DirectDeleteView(BaseDeleteView):
         return self.delete(*args, **kwargs)
 
 
+class DirectBulkDeleteView(MultipleObjectMixin, View):
+    """
+    To directly delete many objects, like ``DirectDeleteView``
+    
+    The objects are selected in "get_queryset()" by their primary keys given with the 
+    "pk_param" parameter (repeated) and by the "bulk_delete_filter_fields" lookups 
+    given as parameters. At least one of them is required. Parameters are read from 
+    the POST data of POST requests and from the query string of DELETE requests, GET 
+    requests are not allowed so objects are not deleted by simply following a link.
+    
+    They are deleted by chunks of "bulk_delete_chunk_size" objects, in the primary 
+    key order, in a transaction (one for all the chunks with "bulk_delete_atomic", 
+    else one per chunk to keep lock times short).
+    
+    "get_success_url" or "success_url" should be correctly filled
+    """
+    pk_param = 'pk'
+    bulk_delete_filter_fields = ()
+    bulk_delete_chunk_size = 1000
+    bulk_delete_atomic = True
+    success_url = None
+    
+    def get_bulk_delete_lookups(self):
+        """
+        Return the lookups to filter the objects to delete, or None if no objects are 
+        selected
+        """
+        data = self.request.POST if self.request.method == 'POST' else self.request.GET
+        lookups = {}
+        pks = data.getlist(self.pk_param)
+        if pks:
+            lookups['pk__in'] = pks
+        for name in self.bulk_delete_filter_fields:
+            if name in data:
+                lookups[name] = data[name]
+        return lookups or None
+    
+    def delete_chunk(self, queryset):
+        queryset.delete()
+    
+    def delete_next_chunk(self, queryset, last_pk):
+        """
+        Delete the chunk of objects following the "last_pk" primary key and return 
+        their primary keys
+        """
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        pks = list(chunk.values_list('pk', flat=True)[:self.bulk_delete_chunk_size])
+        if pks:
+            # The base manager does not hide the selected objects, unlike a default 
+            # manager with filters
+            self.delete_chunk(queryset.model._base_manager.filter(pk__in=pks))
+        return pks
+    
+    def delete_chunks(self, queryset):
+        """
+        Delete the queryset objects chunk by chunk and return their count
+        
+        Chunks are taken by ranges of primary keys, so this ends even when deleted 
+        objects are still in the queryset (like with soft deleting models).
+        """
+        using = router.db_for_write(queryset.model)
+        count = 0
+        last_pk = None
+        while True:
+            if self.bulk_delete_atomic:
+                # Already in the transaction of all the chunks
+                pks = self.delete_next_chunk(queryset, last_pk)
+            else:
+                with atomic(using=using):
+                    pks = self.delete_next_chunk(queryset, last_pk)
+            if not pks:
+                return count
+            count += len(pks)
+            last_pk = pks[-1]
+    
+    def delete(self, request, *args, **kwargs):
+        lookups = self.get_bulk_delete_lookups()
+        if lookups is None:
+            return HttpResponseBadRequest(_(u"No objects to delete."))
+        try:
+            queryset = self.get_queryset().filter(**lookups)
+            queryset.exists()
+        except (ValueError, TypeError, ValidationError):
+            # Invalid primary keys or lookup values
+            return HttpResponseBadRequest(_(u"Invalid objects selection."))
+        if self.bulk_delete_atomic:
+            with atomic(using=router.db_for_write(queryset.model)):
+                self.deleted_count = self.delete_chunks(queryset)
+        else:
+            self.deleted_count = self.delete_chunks(queryset)
+        return HttpResponseRedirect(self.get_success_url())
+    
+    def get_success_url(self):
+        if self.success_url:
+            return self.success_url
+        raise ImproperlyConfigured(u"No URL to redirect to. Provide a success_url.")
+    
+    def post(self, *args, **kwargs):
+        return self.delete(*args, **kwargs)
+
+
 class ListAppendView(SimpleListView, FormMixin):
     """
     A view to display an object list with a form to append a new object
@@ -479,18 +1511,38 @@ class ListAppendView(SimpleListView, FormMixin):
     
     "locked_form" is used to disable form (like if your list object is closed to new 
     object)
+    
+    With "bulk_append", the form is a formset of "form_class" forms (a ``BulkFormSet``) 
+    to append many objects at once. It can also be posted as a JSON array of objects 
+    with the "application/json" content type, then every entry must be valid and the 
+    response is JSON. Objects are validated by the forms (which must be model forms), 
+    then created with ``bulk_create()`` by batches of "bulk_batch_size" in a single 
+    transaction, so their ``save()`` method is not called and no signal is sent.
     """
     model = None
     form_class = None
     template_name = None
     paginate_by = None
     locked_form = False
+    bulk_append = False
+    bulk_formset_class = BulkFormSet
+    bulk_max_entries = 1000
+    bulk_batch_size = 500
     
     def form_valid(self, form):
+        if self.bulk_append:
+            return self.bulk_form_valid(form)
         self.object = form.save()
         return super(ListAppendView, self).form_valid(form)
 
     def form_invalid(self, form):
+        if self.bulk_append and self.is_bulk_json():
+            return self.render_bulk_json_response({
+                'errors': [dict([(name, [force_text(error) for error in errors])
+                                 for name, errors in form_errors.items()])
+                           for form_errors in form.errors],
+                'non_form_errors': [force_text(error) for error in form.non_form_errors()],
+            }, status=400)
         return self.render_to_response(self.get_context_data(object_list=self.object_list, form=form))
 
     def is_locked_form(self):
@@ -502,7 +1554,111 @@ class ListAppendView(SimpleListView, FormMixin):
         """
         if self.is_locked_form():
             return None
+        if self.bulk_append:
+            return self.get_bulk_formset(form_class)
         return form_class(**self.get_form_kwargs())
+    
+    def is_bulk_json(self):
+        content_type = self.request.META.get('CONTENT_TYPE', '')
+        return content_type.split(';')[0].strip() == 'application/json'
+    
+    def get_bulk_entries(self):
+        """
+        Return the list of entries (dicts) of the JSON request body, or None if it is 
+        not a JSON array of objects
+        """
+        if not hasattr(self, '_bulk_entries'):
+            try:
+                entries = json.loads(self.request.body.decode('utf-8'))
+            except (ValueError, UnicodeDecodeError):
+                entries = None
+            if not isinstance(entries, list) or not all([isinstance(entry, dict)
+                                                         for entry in entries]):
+                entries = None
+            self._bulk_entries = entries
+        return self._bulk_entries
+    
+    def get_bulk_json_data(self, prefix):
+        """
+        Return the formset data for the JSON entries
+        """
+        entries = self.get_bulk_entries()
+        data = MultiValueDict()
+        data['%s-TOTAL_FORMS' % prefix] = str(len(entries))
+        data['%s-INITIAL_FORMS' % prefix] = '0'
+        data['%s-MAX_NUM_FORMS' % prefix] = str(self.bulk_max_entries)
+        for index, entry in enumerate(entries[:self.bulk_max_entries + 1]):
+            for name, value in entry.items():
+                key = '%s-%d-%s' % (prefix, index, name)
+                if isinstance(value, list):
+                    data.setlist(key, value)
+                else:
+                    data[key] = value
+        return data
+    
+    def get_bulk_formset_class(self, form_class):
+        return bulk_formset_factory(form_class, formset=self.bulk_formset_class,
+                                    max_entries=self.bulk_max_entries)
+    
+    def get_bulk_formset(self, form_class):
+        """
+        Return the formset, its forms get the form kwargs of the view
+        """
+        formset_class = self.get_bulk_formset_class(form_class)
+        form_kwargs = self.get_form_kwargs()
+        form_kwargs.pop('initial', None)
+        formset_kwargs = {'prefix': form_kwargs.pop('prefix', None)}
+        for name in ('data', 'files'):
+            if name in form_kwargs:
+                formset_kwargs[name] = form_kwargs.pop(name)
+        if 'data' in formset_kwargs and self.is_bulk_json():
+            prefix = formset_kwargs['prefix'] or formset_class.get_default_prefix()
+            formset_kwargs['data'] = self.get_bulk_json_data(prefix)
+            formset_kwargs['strict'] = True
+        return formset_class(bulk_form_kwargs=form_kwargs, **formset_kwargs)
+    
+    def prepare_bulk_object(self, obj):
+        """
+        Return the object to create from the unsaved object of a form
+        """
+        return obj
+    
+    def bulk_create(self, objects):
+        if not objects:
+            return objects
+        model = objects[0].__class__
+        with atomic(using=router.db_for_write(model)):
+            for start in range(0, len(objects), self.bulk_batch_size):
+                model._default_manager.bulk_create(objects[start:start + self.bulk_batch_size])
+        return objects
+    
+    def bulk_form_valid(self, formset):
+        self.objects = self.bulk_create([self.prepare_bulk_object(form.save(commit=False))
+                                         for form in formset.get_changed_forms()])
+        if self.is_bulk_json():
+            return self.render_bulk_json_response({'count': len(self.objects)}, status=201)
+        return HttpResponseRedirect(self.get_success_url())
+    
+    def render_bulk_json_response(self, data, status=200):
+        return HttpResponse(jsonbackends.dumps(data), content_type='application/json',
+                            status=status)
+        
+    def is_empty_list(self, evaluate=False):
+        """
+        Return True if the object list is empty
+        
+        Querysets are checked with an ``exists()`` query, unless "evaluate" is True 
+        (when the whole list is displayed) to fetch them once for the check and the 
+        display.
+        """
+        if evaluate or not hasattr(self.object_list, 'exists'):
+            return not self.object_list
+        return not self.object_list.exists()
+    
+    def check_allow_empty(self, evaluate=False):
+        if not self.get_allow_empty() and self.is_empty_list(evaluate):
+            raise Http404(_(u"Empty list and '%(class_name)s.allow_empty' is False.")
+                          % {'class_name': self.__class__.__name__})
         
     def get(self, request, *args, **kwargs):
         self.object_list = self.get_queryset()
@@ -510,24 +1666,25 @@ class ListAppendView(SimpleListView, FormMixin):
         form_class = self.get_form_class()
         form = self.get_form(form_class)
         
-        allow_empty = self.get_allow_empty()
-        if not allow_empty and len(self.object_list) == 0:
-            raise Http404(_(u"Empty list and '%(class_name)s.allow_empty' is False.")
-                          % {'class_name': self.__class__.__name__})
+        # Paginated lists are not fetched entirely
+        self.check_allow_empty(evaluate=not self.get_paginate_by(self.object_list))
         
         context = self.get_context_data(object_list=self.object_list, form=form)
         return self.render_to_response(context)
 
     def post(self, request, *args, **kwargs):
+        # The list is only fetched if the form is rendered again
         self.object_list = self.get_queryset()
         
+        if self.bulk_append and self.is_bulk_json() and self.get_bulk_entries() is None:
+            return self.render_bulk_json_response({
+                'errors': [], 'non_form_errors': [_(u"Expected a JSON array of objects.")],
+            }, status=400)
+        
         form_class = self.get_form_class()
         form = self.get_form(form_class)
         
-        allow_empty = self.get_allow_empty()
-        if not allow_empty and len(self.object_list) == 0:
-            raise Http404(_(u"Empty list and '%(class_name)s.allow_empty' is False.")
-                          % {'class_name': self.__class__.__name__})
+        self.check_allow_empty()
         
         if form and form.is_valid():
             return self.form_valid(form)
@@ -554,13 +1711,83 @@ class DetailListAppendView(ListAppendView):
     "get_parent_object" must be defined to return the parent instance. "get_queryset" 
     should be defined to make a queryset exclusively on the parent children.
     
+    Or they can be declared : the parent is the "parent_model" (or "parent_queryset") 
+    object with the "parent_lookup_field" value from the "parent_lookup_kwarg" URL 
+    argument, fetched once for the request with "parent_select_related" and 
+    "parent_prefetch_related". The children are then the objects of the 
+    "parent_related_name" reverse relation of the parent.
+    
     The parent object is also given to the append form, under the name defined with the 
     "context_parent_object_name" attribute. Your Form should be aware of this.
     """
     context_parent_object_name = 'parent_object'
+    bulk_parent_field = None
+    parent_model = None
+    parent_queryset = None
+    parent_lookup_kwarg = 'pk'
+    parent_lookup_field = 'pk'
+    parent_related_name = None
+    parent_select_related = None
+    parent_prefetch_related = None
+    
+    def get_bulk_parent_field(self, obj):
+        """
+        Return the name of the field to attach the parent to the objects created in 
+        bulk, "bulk_parent_field" or the only foreign key to the parent model
+        """
+        if self.bulk_parent_field:
+            return self.bulk_parent_field
+        names = [field.name for field in obj._meta.fields
+                 if get_related_model(field) is not None
+                 and isinstance(self.parent_object, get_related_model(field))]
+        if len(names) == 1:
+            return names[0]
+        return None
+    
+    def prepare_bulk_object(self, obj):
+        name = self.get_bulk_parent_field(obj)
+        if name is not None:
+            setattr(obj, name, self.parent_object)
+        return super(DetailListAppendView, self).prepare_bulk_object(obj)
+    
+    def get_parent_queryset(self):
+        if self.parent_queryset is not None:
+            queryset = self.parent_queryset._clone()
+        elif self.parent_model is not None:
+            queryset = self.parent_model._default_manager.all()
+        else:
+            raise ImproperlyConfigured(u"%(cls)s's 'get_parent_object' method must be defined " % {"cls": self.__class__.__name__})
+        if self.parent_select_related:
+            queryset = queryset.select_related(*self.parent_select_related)
+        if self.parent_prefetch_related:
+            queryset = queryset.prefetch_related(*self.parent_prefetch_related)
+        return queryset
     
     def get_parent_object(self):
-        raise ImproperlyConfigured(u"%(cls)s's 'get_parent_object' method must be defined " % {"cls": self.__class__.__name__})
+        """
+        Return the declared parent object, fetched once for the request
+        """
+        if getattr(self, '_parent_object', None) is None:
+            # Raise the configuration error first when nothing is declared
+            queryset = self.get_parent_queryset()
+            lookup = self.kwargs.get(self.parent_lookup_kwarg)
+            if lookup is None:
+                raise AttributeError(u"%(cls)s must be called with the '%(kwarg)s' URL "
+                                     u"argument." % {"cls": self.__class__.__name__,
+                                                     "kwarg": self.parent_lookup_kwarg})
+            self._parent_object = get_object_or_404(queryset,
+                                                    **{self.parent_lookup_field: lookup})
+        return self._parent_object
+    
+    def get_queryset(self):
+        """
+        Return the children of the parent object from the "parent_related_name" 
+        relation if it is declared, it uses the prefetched children if they are in 
+        "parent_prefetch_related"
+        """
+        if self.parent_related_name is None:
+            return super(DetailListAppendView, self).get_queryset()
+        return getattr(self.parent_object, self.parent_related_name).all()
 
     def get_context_data(self, **kwargs):
         kwargs.update({
@@ -607,12 +1834,346 @@ class ExcelExportView(DownloadMixin, View):
     def get_filename(self, context):
         return self.filename_format.format(**context)
 
-class JSONResponseMixin(object):
+
+class BackgroundExportMixin(object):
+    """
+    Mixin to build the content of a ``DownloadMixin`` view in a background job
+    
+    A request starts the export job (if it is not already running) and immediately 
+    gets a "202 Accepted" JSON response with the job id and the URLs to poll its status 
+    and to download it. Finished artifacts are kept in the "export_store" so identical 
+    requests (see "get_export_params()") directly get the file while it is fresh.
+    
+    "export_executor" is the object used to run the jobs, it just needs a 
+    "submit(func, *args, **kwargs)" method. Both default to the ones from 
+    "braces.exports" configured with the "BRACES_EXPORT_*" settings.
+    """
+    export_store = None
+    export_executor = None
+    job_param = 'job'
+    download_param = 'download'
+    export_artifact = None
+    
+    def get_export_store(self):
+        return self.export_store or get_default_store()
+    
+    def get_export_executor(self):
+        return self.export_executor or get_default_executor()
+    
+    def get_export_params(self, context):
+        """
+        Return the strings identifying the export, content depending on something 
+        else than the view, the path and the query string (like the user) should add 
+        it here
+        
+        The export of a job is served to any requester with the same parameters, so 
+        by default users get the exports started by other users for the same URL. 
+        Exports of user dependent content must add the user (like its pk) to them.
+        """
+        query = sorted([(key, value) for key, value in self.request.GET.items()
+                        if key not in (self.job_param, self.download_param)])
+        return [self.__class__.__module__, self.__class__.__name__,
+                self.request.path, urlencode(query)]
+    
+    def get_export_key(self, context):
+        return make_export_key(*self.get_export_params(context))
+    
+    def get_job_status_url(self, key, download=False):
+        """
+        Return the job URL, it keeps the query string of the export parameters
+        """
+        query = self.request.GET.copy()
+        query.pop(self.download_param, None)
+        query[self.job_param] = key
+        if download:
+            query[self.download_param] = 1
+        return '%s?%s' % (self.request.path, query.urlencode())
+    
+    def run_export(self, key, context):
+        """
+        Build the content and store it, this is what runs in the background
+        """
+        store = self.get_export_store()
+        try:
+            content = super(BackgroundExportMixin, self).get_content(context)
+            iterator = ContentIterator(content, self.chunk_size,
+                                       lambda: self.release_content(context, content))
+            try:
+                store.save(key, iterator)
+            finally:
+                iterator.close()
+        except Exception as e:
+            logging.getLogger('braces').exception("Export '%s' has failed", key)
+            store.fail(key, force_text(e))
+        finally:
+            # Connections opened in the job thread would never be closed by the 
+            # request cycle
+            for connection in connections.all():
+                connection.close()
+    
+    def start_export(self, key, context):
+        if self.get_export_store().acquire(key):
+            self.get_export_executor().submit(self.run_export, key, context)
+    
+    def render_job_response(self, key, job_status, **response_kwargs):
+        data = {
+            'job': key,
+            'status': job_status,
+            'status_url': self.get_job_status_url(key),
+        }
+        if job_status == 'done':
+            data['download_url'] = self.get_job_status_url(key, download=True)
+        return HttpResponse(json.dumps(data), content_type='application/json',
+                            **response_kwargs)
+    
+    def get_content(self, context):
+        if self.export_artifact is not None:
+            return open(self.export_artifact, 'rb')
+        return super(BackgroundExportMixin, self).get_content(context)
+    
+    def is_streaming(self, context, content):
+        if self.export_artifact is not None:
+            return True
+        return super(BackgroundExportMixin, self).is_streaming(context, content)
+    
+    def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        store = self.get_export_store()
+        key = request.GET.get(self.job_param)
+        if key is not None:
+            # Poll on an existing job, only with the parameters it was started with
+            if not constant_time_compare(key, self.get_export_key(context)):
+                raise Http404
+            status = store.status(key)
+            if status is None:
+                raise Http404
+            if status != 'done' or self.download_param not in request.GET:
+                return self.render_job_response(key, status)
+            self.export_artifact = store.get(key)
+            if self.export_artifact is None:
+                raise Http404
+            return self.render_to_response(context)
+        
+        key = self.get_export_key(context)
+        self.export_artifact = store.get(key)
+        if self.export_artifact is None:
+            if store.status(key) != 'running':
+                self.start_export(key, context)
+            return self.render_job_response(key, store.status(key) or 'running',
+                                            status=202)
+        return self.render_to_response(context)
+
+
+class CoalescingDownloadMixin(object):
+    """
+    Mixin to build the content of a ``DownloadMixin`` view only once for identical 
+    concurrent requests
+    
+    The first request for a coalescing key (see "get_coalesce_key()") builds the 
+    content while the others wait for it and share it. With "coalesce_cache" set to a 
+    cache alias, requests from other processes are coalesced too through the cache 
+    backend (the content is then stored there for "coalesce_result_timeout" seconds).
+    
+    The shared content is read in memory, so this is not meant for huge contents 
+    (see ``BackgroundExportMixin`` for them). It is released by the request which 
+    builds it, ``release_content()`` is not called again with the shared string.
+    """
+    coalesce_cache = None
+    coalesce_timeout = 60
+    coalesce_result_timeout = 10
+    shared_content = None
+    
+    def get_coalesce_key(self, context):
+        """
+        Return the key identifying the requests sharing the same content, content 
+        depending on something else than the view, the full path and the filename 
+        (like the user) must add it to the key
+        """
+        return make_export_key(self.__class__.__module__, self.__class__.__name__,
+                               self.request.get_full_path(), self.get_filename(context))
+    
+    def build_shared_content(self, context):
+        """
+        Build the content and read it in a string to be shared
+        """
+        content = super(CoalescingDownloadMixin, self).get_content(context)
+        try:
+            if isinstance(content, basestring):
+                return content
+            if hasattr(content, 'read'):
+                return content.read()
+            return ''.join(content)
+        finally:
+            self.release_content(context, content)
+    
+    def get_content(self, context):
+        cache = None
+        if self.coalesce_cache is not None:
+            cache = get_cache_backend(self.coalesce_cache)
+        self.shared_content = default_flight.do(self.get_coalesce_key(context),
+                                                lambda: self.build_shared_content(context),
+                                                cache=cache, timeout=self.coalesce_timeout,
+                                                result_timeout=self.coalesce_result_timeout)
+        return self.shared_content
+    
+    def release_content(self, context, content):
+        # The shared content has already been released when it was built
+        if self.shared_content is not None and content is self.shared_content:
+            return
+        super(CoalescingDownloadMixin, self).release_content(context, content)
+
+
+class EchoBuffer(object):
+    """
+    File-like object which just returns what is written, to get the output of a 
+    ``csv.writer`` row by row
+    """
+    def write(self, value):
+        return value
+
+
+class RowExportMixin(object):
+    """
+    Mixin to stream an export built from the rows of a queryset, to use with a 
+    ``DownloadMixin`` view like ``ExcelExportView``
+    
+    "columns" is a list of field lookups (like "author__name") or of 
+    "(lookup, header)" tuples, only these columns are fetched from the database with 
+    "values_list()" and rows are fetched by chunks of "iterator_chunk_size" (one 
+    query per chunk, see ``queryset_iterator()``) so the memory usage does not depend 
+    of the row count when the queryset is ordered by primary key.
+    
+    "export_format" is the name of the writer to use, "csv" or "spreadsheetml" (the 
+    Excel 2003 XML format).
+    """
+    model = None
+    queryset = None
+    columns = None
+    export_format = 'csv'
+    include_headers = True
+    iterator_chunk_size = 2000
+    streaming = True
+    
+    def get_queryset(self):
+        if self.queryset is not None:
+            return self.queryset._clone()
+        if self.model is not None:
+            return self.model._default_manager.all()
+        raise ImproperlyConfigured(u"%(cls)s is missing a queryset. Define "
+            u"%(cls)s.model, %(cls)s.queryset, or override "
+            u"%(cls)s.get_queryset()." % {"cls": self.__class__.__name__})
+    
+    def get_columns(self):
+        """
+        Return the columns as a list of "(lookup, header)" tuples
+        """
+        if not self.columns:
+            raise ImproperlyConfigured(u"%(cls)s is missing the columns property. "
+                u"This must be a tuple or list." % {"cls": self.__class__.__name__})
+        columns = []
+        for column in self.columns:
+            if isinstance(column, basestring):
+                column = (column, column)
+            columns.append(tuple(column))
+        return columns
+    
+    def get_rows(self, context):
+        """
+        Return an iterator on the row values tuples
+        """
+        lookups = [lookup for lookup, header in self.get_columns()]
+        queryset = self.get_queryset().values_list(*lookups)
+        return queryset_iterator(queryset, self.iterator_chunk_size)
+    
+    def get_content(self, context):
+        writer = getattr(self, 'iter_%s' % self.export_format, None)
+        if writer is None:
+            raise ImproperlyConfigured(u"%(cls)s has an unknown export_format "
+                u"'%(format)s'." % {"cls": self.__class__.__name__,
+                                    "format": self.export_format})
+        headers = None
+        if self.include_headers:
+            headers = [header for lookup, header in self.get_columns()]
+        return self.buffer_lines(writer(self.get_rows(context), headers))
+    
+    def buffer_lines(self, lines):
+        """
+        Join the written lines in chunks of about ``chunk_size`` characters to avoid 
+        sending a lot of tiny chunks
+        """
+        buffered, size = [], 0
+        for line in lines:
+            buffered.append(line)
+            size += len(line)
+            if size >= self.chunk_size:
+                yield ''.join(buffered)
+                buffered, size = [], 0
+        if buffered:
+            yield ''.join(buffered)
+    
+    def iter_csv(self, rows, headers=None):
+        writer = csv.writer(EchoBuffer())
+        if headers is not None:
+            yield writer.writerow([smart_str(value) for value in headers])
+        for row in rows:
+            yield writer.writerow([smart_str(value) if value is not None else ''
+                                   for value in row])
+    
+    def iter_spreadsheetml(self, rows, headers=None):
+        yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+               '<?mso-application progid="Excel.Sheet"?>\n'
+               '<Workbook xmlns="urn:schemas-microsoft-com:office:spreadsheet" '
+               'xmlns:ss="urn:schemas-microsoft-com:office:spreadsheet">\n'
+               '<Worksheet ss:Name="Sheet1"><Table>\n')
+        if headers is not None:
+            yield self._spreadsheetml_row(headers)
+        for row in rows:
+            yield self._spreadsheetml_row(row)
+        yield '</Table></Worksheet></Workbook>\n'
+    
+    def _spreadsheetml_row(self, values):
+        cells = []
+        for value in values:
+            if value is None:
+                cells.append('<Cell/>')
+            elif isinstance(value, (int, long, float, decimal.Decimal)) and not isinstance(value, bool):
+                cells.append('<Cell><Data ss:Type="Number">%s</Data></Cell>' % value)
+            else:
+                cells.append('<Cell><Data ss:Type="String">%s</Data></Cell>'
+                             % xml_escape(force_text(value)))
+        return '<Row>%s</Row>\n' % ''.join(cells)
+
+
+class CSVExportView(RowExportMixin, ExcelExportView):
+    """
+    Generic view to stream a CSV export of "columns" from a queryset
+    """
+    content_type = 'text/csv'
+    filename_format = "file_{timestamp}.csv"
+    export_format = 'csv'
+
+
+class SpreadsheetExportView(RowExportMixin, ExcelExportView):
+    """
+    Generic view to stream an Excel spreadsheet (XML format) export of "columns" from 
+    a queryset
+    """
+    filename_format = "file_{timestamp}.xls"
+    export_format = 'spreadsheetml'
+
+class JSONResponseMixin(GZipResponseMixin):
     """
     A mixin that allows you to easily serialize simple data such as a dict or
     Django models.
+
+    Plain data is encoded with the fastest installed JSON library, see 
+    ``braces.jsonbackends``, "json_backend" forces a backend for the view.
     """
     content_type = "application/json"
+    ndjson_content_type = "application/x-ndjson"
+    json_backend = None
+    json_stream_chunk_size = 500
+    json_fields = None
 
     def get_content_type(self):
         if self.content_type is None:
@@ -628,8 +2189,10 @@ class JSONResponseMixin(object):
         Limited serialization for shipping plain data. Do not use for models
         or other complex or custom objects.
         """
-        json_context = json.dumps(context_dict, cls=DjangoJSONEncoder, ensure_ascii=False)
-        return HttpResponse(json_context, content_type=self.get_content_type())
+        json_context = jsonbackends.dumps(context_dict, ensure_ascii=False,
+                                          backend=self.json_backend)
+        response = HttpResponse(json_context, content_type=self.get_content_type())
+        return self.compress_response(response)
 
     def render_json_object_response(self, objects, **kwargs):
         """
@@ -637,7 +2200,121 @@ class JSONResponseMixin(object):
         kwargs can be used the same way for django.core.serializers.serialize.
         """
         json_data = serializers.serialize("json", objects, **kwargs)
-        return HttpResponse(json_data, content_type=self.get_content_type())
+        response = HttpResponse(json_data, content_type=self.get_content_type())
+        return self.compress_response(response)
+
+    def iter_json_chunks(self, batches, ndjson=False):
+        """
+        Yield a JSON array (or the lines of NDJSON) chunk by chunk from batches of 
+        data to encode
+        """
+        separator = b'\n' if ndjson else b','
+        first = True
+        if not ndjson:
+            yield b'['
+        for batch in batches:
+            if not batch:
+                continue
+            chunk = separator.join([jsonbackends.dumps(data, backend=self.json_backend)
+                                    for data in batch])
+            if ndjson:
+                yield chunk + separator
+            else:
+                yield chunk if first else separator + chunk
+            first = False
+        if not ndjson:
+            yield b']'
+
+    def iter_batches(self, objects):
+        """
+        Split objects in lists of "json_stream_chunk_size" items, querysets are 
+        fetched by chunks of the same size with ``queryset_iterator()`` (one query per 
+        chunk when they are ordered by primary key)
+        """
+        if hasattr(objects, 'iterator'):
+            objects = queryset_iterator(objects, self.json_stream_chunk_size)
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.json_stream_chunk_size))
+            if not batch:
+                break
+            yield batch
+
+    def iter_json_objects(self, objects, ndjson=False, **kwargs):
+        """
+        Serialize objects by batches and yield the JSON array (or the lines of 
+        NDJSON) chunk by chunk
+        """
+        serializer = serializers.get_serializer("python")()
+        batches = (serializer.serialize(batch, **kwargs)
+                   for batch in self.iter_batches(objects))
+        return self.iter_json_chunks(batches, ndjson)
+
+    def get_json_fields(self):
+        """
+        Return the fields for ``render_json_values_response`` as a list of 
+        "(lookup, key)" tuples
+        """
+        if not self.json_fields:
+            raise ImproperlyConfigured(u"%(cls)s is missing the json_fields property. "
+                u"This must be a tuple or list." % {"cls": self.__class__.__name__})
+        return self.normalize_json_fields(self.json_fields)
+
+    def normalize_json_fields(self, fields):
+        """
+        Return the fields as a list of "(lookup, key)" tuples, a field given as a 
+        string is used as both
+        """
+        normalized = []
+        for field in fields:
+            if isinstance(field, basestring):
+                field = (field, field)
+            normalized.append(tuple(field))
+        return normalized
+
+    def iter_json_values(self, queryset, fields=None):
+        """
+        Yield a dict for each row with only the given fields (like "json_fields"), 
+        built directly from the "values_list()" tuples
+        """
+        if fields is None:
+            fields = self.get_json_fields()
+        else:
+            fields = self.normalize_json_fields(fields)
+        lookups = [lookup for lookup, key in fields]
+        keys = [key for lookup, key in fields]
+        for batch in self.iter_batches(queryset.values_list(*lookups)):
+            for values in batch:
+                yield dict(zip(keys, values))
+
+    def render_json_values_response(self, queryset, fields=None, stream=False,
+                                    ndjson=False):
+        """
+        Fast serialization of a queryset as a list of dicts with only the fields from 
+        "json_fields" (lookups like "author__name" can be used), without building 
+        model instances. With ``stream`` (or ``ndjson``) the response is streamed.
+        """
+        values = self.iter_json_values(queryset, fields)
+        if stream or ndjson:
+            batches = self.iter_batches(values)
+            content_type = self.ndjson_content_type if ndjson else self.get_content_type()
+            response = StreamingHttpResponse(self.iter_json_chunks(batches, ndjson),
+                                             content_type=content_type)
+        else:
+            response = HttpResponse(jsonbackends.dumps(list(values),
+                                                       backend=self.json_backend),
+                                    content_type=self.get_content_type())
+        return self.compress_response(response)
+
+    def render_json_object_stream_response(self, objects, ndjson=False, **kwargs):
+        """
+        Like ``render_json_object_response`` but streams the serialized objects as a 
+        JSON array, or as NDJSON (one object per line) if ``ndjson`` is True
+        """
+        content_type = self.ndjson_content_type if ndjson else self.get_content_type()
+        response = StreamingHttpResponse(self.iter_json_objects(objects, ndjson, **kwargs),
+                                         content_type=content_type)
+        return self.compress_response(response)
 
 class JSONResponseExtendedMixin(JSONResponseMixin):
     """
@@ -651,14 +2328,12 @@ class JSONResponseExtendedMixin(JSONResponseMixin):
     json_ensure_ascii = False
     
     def encode_context(self, context):
-        json_kwargs = {}
-        if self.json_indent is not None:
-            json_kwargs['indent'] = self.json_indent
-        if self.json_encoder is not None:
-            json_kwargs['encoder'] = self.json_encoder
-        if self.json_ensure_ascii is not None:
-            json_kwargs['ensure_ascii'] = self.json_ensure_ascii
-        return json.dumps(context, **json_kwargs)
+        """
+        Return the context encoded as an UTF-8 JSON bytestring
+        """
+        return jsonbackends.dumps(context, indent=self.json_indent,
+                                  ensure_ascii=bool(self.json_ensure_ascii),
+                                  cls=self.json_encoder, backend=self.json_backend)
 
     def render_json_response(self, context_dict, **response_kwargs):
         """
@@ -667,16 +2342,124 @@ class JSONResponseExtendedMixin(JSONResponseMixin):
         """
         if 'content_type' not in response_kwargs:
             response_kwargs['content_type'] = self.get_content_type()
-        return HttpResponse(self.encode_context(context), **response_kwargs)
+        response = HttpResponse(self.encode_context(context_dict), **response_kwargs)
+        return self.compress_response(response)
 
 
 class JSONResponseViewMixin(JSONResponseExtendedMixin):
-    """Mixin to directly return a JSON response"""
+    """
+    Mixin to directly return a JSON response
+    
+    With "json_cache" enabled, the encoded responses are cached with an ETag computed 
+    from their content. Requests for a cached response are answered instead of calling 
+    the view method (after the access checks of the other mixins, whatever their 
+    order), with a "304 Not Modified" response if the client already has it. The cache is a bounded in-process LRU cache of "json_cache_size" entries 
+    unless "json_cache_alias" names a Django cache backend.
+    """
+    json_cache = False
+    json_cache_alias = None
+    json_cache_timeout = 60
+    json_cache_size = 128
+    json_cache_gzip = False
+    
+    def get_json_cache(self):
+        if self.json_cache_alias is not None:
+            return get_cache_backend(self.json_cache_alias)
+        cls = self.__class__
+        cache = cls.__dict__.get('_json_lru_cache')
+        if cache is None:
+            cache = LRUCache(self.json_cache_size)
+            cls._json_lru_cache = cache
+        return cache
+    
+    def get_json_cache_key(self):
+        """
+        Return the key identifying the response content, the full path and the user 
+        pk by default (so users never get the cached content of another user). Views 
+        whose content does not depend on the user can drop it to share the cache.
+        """
+        user = getattr(self.request, 'user', None)
+        return u'%s:%s' % (self.request.get_full_path(), getattr(user, 'pk', None))
+    
+    def get_json_cache_version(self):
+        """
+        Return a cheap value changing when the content changes (like the last update 
+        date of the listed objects), or None. It is part of the cache key so cached 
+        responses are not used anymore once it has changed.
+        """
+        return None
+    
+    def _build_json_cache_key(self):
+        key = u'%s.%s:%s:%s' % (self.__class__.__module__, self.__class__.__name__,
+                                self.get_json_cache_key(), self.get_json_cache_version())
+        return 'braces.json.%s' % hashlib.md5(key.encode('utf-8')).hexdigest()
+    
+    def render_json_cache_entry(self, entry, **response_kwargs):
+        """
+        Return the response for a cache entry, or a "304 Not Modified" response if the 
+        client already has it
+        """
+        if_none_match = self.request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None and etag_matches(if_none_match, entry['etag']):
+            response = HttpResponseNotModified()
+            response['ETag'] = entry['etag']
+            return response
+        response_kwargs.setdefault('status', entry.get('status', 200))
+        if 'content_type' not in response_kwargs:
+            response_kwargs['content_type'] = entry.get('content_type') or self.get_content_type()
+        response = HttpResponse(entry['body'], **response_kwargs)
+        response['ETag'] = entry['etag']
+        if entry.get('gzip') is not None and self.should_compress_response(response):
+            # Use the already compressed content
+            response.content = entry['gzip']
+            response['Content-Length'] = str(len(entry['gzip']))
+            response['Content-Encoding'] = 'gzip'
+            response['ETag'] = 'W/' + entry['etag']
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+        return self.compress_response(response)
+    
+    def get_json_cache_handler(self, handler):
+        """
+        Return the view method wrapped to answer with the cached response if there 
+        is one
+        """
+        def cached_handler(request, *args, **kwargs):
+            self._json_cache_key = self._build_json_cache_key()
+            entry = self.get_json_cache().get(self._json_cache_key)
+            if entry is not None:
+                return self.render_json_cache_entry(entry)
+            return handler(request, *args, **kwargs)
+        return cached_handler
+    
+    def dispatch(self, request, *args, **kwargs):
+        self._json_cache_key = None
+        method = request.method.lower()
+        if self.json_cache and method in ('get', 'head') and hasattr(self, method):
+            # The cache is only looked up when the view method is called, after the 
+            # access checks of all the mixins' dispatch()
+            setattr(self, method, self.get_json_cache_handler(getattr(self, method)))
+        return super(JSONResponseViewMixin, self).dispatch(request, *args, **kwargs)
+    
     def render_to_response(self, context, **response_kwargs):
         """
-        Returns a response with a template rendered with the given context.
+        Returns a response with the given context encoded as JSON.
+        
+        Only successful (2xx) responses are cached.
         """
-        return self.json_to_response(context)
+        status = response_kwargs.pop('status', 200)
+        if not getattr(self, '_json_cache_key', None) or not 200 <= status < 300:
+            return self.render_json_response(context, status=status, **response_kwargs)
+        body = self.encode_context(context)
+        entry = {
+            'etag': quote_etag(hashlib.md5(body).hexdigest()),
+            'body': body,
+            'gzip': gzip_string(body, self.gzip_level) if self.json_cache_gzip else None,
+            'status': status,
+            'content_type': response_kwargs.pop('content_type', None),
+        }
+        self.get_json_cache().set(self._json_cache_key, entry, self.json_cache_timeout)
+        return self.render_json_cache_entry(entry, **response_kwargs)
 
 class AjaxResponseMixin(object):
     """